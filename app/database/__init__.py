@@ -1,4 +1,4 @@
 # Database module initialization
-from .database import engine, SessionLocal, Base, get_db
+from .database import engine, SessionLocal, Base, get_db, async_engine, AsyncSessionLocal, get_async_db, get_async_sessionmaker, read_replicas, get_read_db
 
-__all__ = ["engine", "SessionLocal", "Base", "get_db"]
\ No newline at end of file
+__all__ = ["engine", "SessionLocal", "Base", "get_db", "async_engine", "AsyncSessionLocal", "get_async_db", "get_async_sessionmaker", "read_replicas", "get_read_db"]
@@ -0,0 +1,154 @@
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from app.utils.metrics import DB_QUERY_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Statement types reported as their own label; everything else is "OTHER"
+QUERY_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+# Statements slower than this are logged (0 logs every statement)
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", 200))
+
+# Development guard against N+1 patterns: fail a request that issues more
+# statements than this (0 disables)
+MAX_QUERIES_PER_REQUEST = int(os.getenv("SQL_MAX_QUERIES_PER_REQUEST", 0))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|%\(\w+\)s|(?<!:):\w+|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_ROWS = re.compile(r"(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryStats:
+    """
+    Statements issued while handling one request, and their total time
+    """
+    __slots__ = ("path", "count", "duration")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.duration = 0.0
+
+    def server_timing(self) -> str:
+        noun = "query" if self.count == 1 else "queries"
+        return f'db;dur={self.duration * 1000:.3f};desc="{self.count} {noun}"'
+
+
+# Stats for the request being handled; set by QueryStatsMiddleware
+request_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Collapse a statement into a stable shape for logging: literals and bind
+    parameters become ?, IN lists and multi-row VALUES are folded, and
+    whitespace is squeezed
+    """
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _LITERALS.sub("?", normalized)
+    normalized = _VALUES_ROWS.sub(r"\1, ...", normalized)
+    return _PLACEHOLDER_LISTS.sub("(?, ...)", normalized)
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in QUERY_OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        if MAX_QUERIES_PER_REQUEST and stats.count > MAX_QUERIES_PER_REQUEST:
+            raise AssertionError(
+                f"{stats.path} issued more than {MAX_QUERIES_PER_REQUEST} queries "
+                f"(possible N+1): {normalize_sql(statement)}"
+            )
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_started
+    DB_QUERY_DURATION.labels(_operation(statement)).observe(duration)
+
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.duration += duration
+    if duration * 1000 >= SLOW_QUERY_MS:
+        where = f" in {stats.path}" if stats is not None else ""
+        logger.warning(f"Slow query ({duration * 1000:.1f} ms{where}): {normalize_sql(statement)}")
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Time every statement run on engine (pass async_engine.sync_engine for an
+    async engine): Prometheus histogram, per-request stats and slow-query log
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware collecting per-request query stats and reporting them
+    in a Server-Timing header, e.g. db;dur=1.234;desc="2 queries".
+    Statements a streaming response issues after its headers are sent count
+    towards the query limit but not the header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        token = request_query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_query_stats.reset(token)
+
+
+class PoolStatsCollector:
+    """
+    Prometheus collector reading connection pool gauges from each engine at
+    scrape time. Pools without a fixed size (NullPool, StaticPool) are skipped.
+    """
+
+    def __init__(self, engines: Dict[str, Engine]):
+        self.engines = engines
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        gauges = {
+            "size": GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["engine"]),
+            "checkedout": GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"]),
+            "checkedin": GaugeMetricFamily("db_pool_checked_in", "Idle connections in the pool", labels=["engine"]),
+            "overflow": GaugeMetricFamily("db_pool_overflow", "Connections open beyond the pool size", labels=["engine"]),
+        }
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            for attr, gauge in gauges.items():
+                gauge.add_metric([name], getattr(pool, attr)())
+        yield from gauges.values()
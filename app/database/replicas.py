@@ -0,0 +1,64 @@
+import itertools
+import logging
+import time
+from typing import List
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+
+class ReadReplicaRouter:
+    """
+    Round-robin choice of read-replica session factories with passive health
+    tracking. A replica whose connection fails (connect error or disconnect)
+    is skipped for retry_after seconds, then tried again. When no replica is
+    healthy, or none is configured, sessions come from the primary.
+
+    Replicas lag the primary, so only reads that tolerate slightly stale data
+    should use them.
+    """
+
+    def __init__(self, engines: List[AsyncEngine], primary: async_sessionmaker, retry_after: float = 30.0):
+        self.engines = engines
+        self.primary = primary
+        self.retry_after = retry_after
+        self._sessionmakers = [
+            async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            for engine in engines
+        ]
+        self._unhealthy_until = [0.0] * len(engines)
+        self._counter = itertools.count()
+        self.failovers = 0
+        for index, engine in enumerate(engines):
+            event.listen(engine.sync_engine, "handle_error", self._error_handler(index))
+
+    def _error_handler(self, index: int):
+        def handle_error(context) -> None:
+            # connection is None when the error happened while connecting
+            if context.is_disconnect or context.connection is None:
+                self.mark_unhealthy(index)
+        return handle_error
+
+    def mark_unhealthy(self, index: int) -> None:
+        if self._unhealthy_until[index] <= time.monotonic():
+            logger.warning(f"Read replica {index} failed; routing reads elsewhere for {self.retry_after}s")
+        self._unhealthy_until[index] = time.monotonic() + self.retry_after
+
+    def sessionmaker(self) -> async_sessionmaker:
+        """
+        Session factory for the next healthy replica, or the primary
+        """
+        if self._sessionmakers:
+            now = time.monotonic()
+            start = next(self._counter)
+            for offset in range(len(self._sessionmakers)):
+                index = (start + offset) % len(self._sessionmakers)
+                if self._unhealthy_until[index] <= now:
+                    return self._sessionmakers[index]
+            self.failovers += 1
+        return self.primary
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
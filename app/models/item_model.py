@@ -1,8 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
-
-Base = declarative_base()
+from app.database import Base
 
 class Item(Base):
     __tablename__ = "items"
@@ -10,6 +9,48 @@ class Item(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=True)
-    external_data = Column(Text, nullable=True)  # To store data fetched from external API
+    # Data fetched from external API, stored as JSONB on PostgreSQL and JSON elsewhere
+    external_data = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Serves containment filters on external_data keys (external_data @> '{"userId": 1}')
+        Index("ix_items_external_data", external_data, postgresql_using="gin").ddl_if(dialect="postgresql"),
+        # Serves title_prefix filters (title LIKE 'x%'); the plain title index only
+        # does that under the C collation
+        Index("ix_items_title_pattern", title, postgresql_ops={"title": "text_pattern_ops"}).ddl_if(dialect="postgresql"),
+    )
+
+
+# Full-text search support, created alongside the items table.
+# PostgreSQL: a generated tsvector column with a GIN index.
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+SEARCH_DDL = [
+    DDL(
+        "ALTER TABLE items ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        "(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))) STORED"
+    ).execute_if(dialect="postgresql"),
+    DDL("CREATE INDEX ix_items_search_vector ON items USING gin (search_vector)").execute_if(dialect="postgresql"),
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+        "title, description, content='items', content_rowid='id')"
+    ).execute_if(dialect="sqlite"),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN "
+        "INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+    ).execute_if(dialect="sqlite"),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN "
+        "INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END"
+    ).execute_if(dialect="sqlite"),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF title, description ON items BEGIN "
+        "INSERT INTO items_fts(items_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO items_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"
+    ).execute_if(dialect="sqlite"),
+]
+
+for ddl in SEARCH_DDL:
+    event.listen(Item.__table__, "after_create", ddl)
+event.listen(Item.__table__, "before_drop", DDL("DROP TABLE IF EXISTS items_fts").execute_if(dialect="sqlite"))
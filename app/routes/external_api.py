@@ -1,90 +1,249 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.database import get_async_sessionmaker
 from app.models.item_model import Item
-from app.schemas.item_schema import ItemResponse, ExternalApiResponse
-import requests
-import os
-from typing import List
+from app.schemas.item_schema import ItemResponse, ExternalApiResponse, EnrichmentJobCreate, EnrichmentJobStatus
+from app.utils.enrichment import EnrichmentJob, EnrichmentJobManager, get_enrichment_jobs
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.external_api_service import ExternalAPIService, get_external_api_service
+from app.utils.single_flight import SingleFlight
+from app.utils.item_cache import ItemCache, get_item_cache
+from app.utils.json_response import json_bytes_response
+from app.utils.write_behind import ExternalDataWriteBehind, get_external_data_writes
+from datetime import datetime
+import math
+from pydantic import TypeAdapter
+from typing import List, Optional
 
 router = APIRouter()
 
+# Validates and serializes upstream posts to JSON bytes in one pass
+_posts_adapter = TypeAdapter(List[ExternalApiResponse])
+
+# Concurrent enrichments of the same item share one upstream call and one UPDATE
+_enrichment_flight = SingleFlight()
+
+def _upstream_unavailable(e: CircuitOpenError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"External API unavailable: {str(e)}",
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+
 @router.get("/external/fetch-data/{item_id}", response_model=ItemResponse)
-def fetch_external_data(item_id: int, db: Session = Depends(get_db)):
+async def fetch_external_data(item_id: int,
+                              session_factory: async_sessionmaker = Depends(get_async_sessionmaker),
+                              service: ExternalAPIService = Depends(get_external_api_service),
+                              cache: ItemCache = Depends(get_item_cache),
+                              writes: ExternalDataWriteBehind = Depends(get_external_data_writes)):
     """
     Fetch data from external API and update the item with external data
     This endpoint demonstrates integration with an external API (using JSONPlaceholder as example)
+
+    The session is only opened after the upstream call, so no pooled DB
+    connection is checked out while waiting on the external API.
+    Concurrent requests for the same item are coalesced into one fetch and
+    write; the shared task opens its own session rather than borrowing the
+    first caller's, so a cancelled request cannot close it under the others.
+    With WRITE_BEHIND_ENABLED the write is queued and flushed in batches.
     """
-    # Get the existing item
-    db_item = db.query(Item).filter(Item.id == item_id).first()
-    if not db_item:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item not found"
-        )
-    
+    return await _enrichment_flight.do(item_id, lambda: _enrich_item(item_id, session_factory, service, cache, writes))
+
+
+async def _enrich_item(item_id: int, session_factory: async_sessionmaker, service: ExternalAPIService,
+                       cache: ItemCache, writes: ExternalDataWriteBehind) -> ItemResponse:
+    # Fetch data from external API (using JSONPlaceholder as example)
+    # In a real application, this would be an LLM provider, GitHub API, or other service
     try:
-        # Fetch data from external API (using JSONPlaceholder as example)
-        # In a real application, this would be an LLM provider, GitHub API, or other service
-        external_url = f"https://jsonplaceholder.typicode.com/posts/{item_id}"
-        response = requests.get(external_url, timeout=10)
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail="Failed to fetch data from external API"
-            )
-        
-        external_data = response.json()
-        
-        # Update the item with external data
-        db_item.external_data = str(external_data)
-        db.commit()
-        db.refresh(db_item)
-        
-        return db_item
-        
-    except requests.exceptions.RequestException as e:
+        external_data = await service.get_cached(f"posts/{item_id}")
+    except CircuitOpenError as e:
+        raise _upstream_unavailable(e)
+
+    if external_data is None:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Error connecting to external API: {str(e)}"
+            detail="Failed to fetch data from external API"
+        )
+
+    async with session_factory() as db:
+        return await _store_external_data(item_id, external_data, db, cache, writes)
+
+
+async def _store_external_data(item_id: int, external_data: dict, db: AsyncSession,
+                               cache: ItemCache, writes: ExternalDataWriteBehind) -> ItemResponse:
+    if writes.running:
+        item = await _queue_external_data(item_id, external_data, db, cache, writes)
+        if item is not None:
+            return item
+
+    try:
+        # Update the item with external data in a single UPDATE ... RETURNING
+        items_table = Item.__table__
+        result = await db.execute(
+            update(items_table)
+            .where(items_table.c.id == item_id)
+            .values(external_data=external_data, updated_at=datetime.utcnow())
+            .returning(items_table)
         )
+        db_item = result.one_or_none()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing external data: {str(e)}"
         )
 
+    if db_item is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Item not found"
+        )
+
+    item = ItemResponse.model_validate(db_item)
+    await cache.set(item_id, item.model_dump(mode="json"))
+    return item
+
+
+async def _queue_external_data(item_id: int, external_data: dict, db: AsyncSession, cache: ItemCache,
+                               writes: ExternalDataWriteBehind) -> Optional[ItemResponse]:
+    """
+    Hand the write to the write-behind queue and answer from the cached (or
+    current) row. The cache is updated right away so reads through it see the
+    new data before the flush. Returns None if the queue did not accept the
+    write, in which case it is written directly.
+    """
+    current = await cache.get(item_id, "fetch_data")
+    if current is None:
+        items_table = Item.__table__
+        result = await db.execute(select(items_table).where(items_table.c.id == item_id))
+        db_item = result.one_or_none()
+        if db_item is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Item not found"
+            )
+        current = dict(db_item._mapping)
+
+    updated_at = datetime.utcnow()
+    if not writes.submit(item_id, external_data, updated_at):
+        return None
+    item = ItemResponse.model_validate({**current, "external_data": external_data, "updated_at": updated_at})
+    await cache.set(item_id, item.model_dump(mode="json"))
+    return item
+
 
 @router.get("/external/posts", response_model=List[ExternalApiResponse])
-def get_external_posts():
+async def get_external_posts(service: ExternalAPIService = Depends(get_external_api_service)):
     """
     Get posts from external API without storing in local database
     """
     try:
         # Fetch posts from external API
-        external_url = "https://jsonplaceholder.typicode.com/posts"
-        response = requests.get(external_url, timeout=10)
-        
-        if response.status_code != 200:
+        posts = await service.get_cached("posts")
+
+        if posts is None:
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail="Failed to fetch posts from external API"
             )
-        
-        posts = response.json()
-        
+
         # Return only the first 5 posts to avoid too much data
-        return [ExternalApiResponse(**post) for post in posts[:5]]
-        
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Error connecting to external API: {str(e)}"
-        )
+        return json_bytes_response(_posts_adapter.dump_json(_posts_adapter.validate_python(posts[:5])))
+
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise _upstream_unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing external data: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/external/cache/stats")
+def get_external_cache_stats(service: ExternalAPIService = Depends(get_external_api_service)):
+    """
+    Get hit/miss/eviction counters for the external API response cache,
+    plus how many expired entries upstream confirmed unchanged (304)
+    """
+    return {**service.cache.stats(), "revalidated": service.revalidated}
+
+
+@router.get("/external/breakers")
+def get_external_breakers(service: ExternalAPIService = Depends(get_external_api_service)):
+    """
+    Get circuit breaker state per upstream host
+    """
+    return service.breaker_stats()
+
+
+@router.get("/external/write-behind/stats")
+def get_write_behind_stats(writes: ExternalDataWriteBehind = Depends(get_external_data_writes)):
+    """
+    Get queue depth and flush counters for batched external_data writes
+    """
+    return writes.stats()
+
+
+def _get_job_or_404(jobs: EnrichmentJobManager, job_id: str) -> EnrichmentJob:
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Enrichment job not found"
+        )
+    return job
+
+
+@router.post("/external/enrich", response_model=EnrichmentJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_enrichment_job(request: EnrichmentJobCreate,
+                               session_factory: async_sessionmaker = Depends(get_async_sessionmaker),
+                               service: ExternalAPIService = Depends(get_external_api_service),
+                               jobs: EnrichmentJobManager = Depends(get_enrichment_jobs)):
+    """
+    Start a background job that fetches external data for many items.
+    Select items with item_ids and/or title_prefix / only_missing filters;
+    after_id resumes a previous run from its last_item_id.
+    """
+    job = jobs.submit(request, session_factory, service)
+    return job.to_status()
+
+
+@router.get("/external/enrich/{job_id}", response_model=EnrichmentJobStatus)
+def get_enrichment_job(job_id: str, jobs: EnrichmentJobManager = Depends(get_enrichment_jobs)):
+    """
+    Get the progress of an enrichment job
+    """
+    return _get_job_or_404(jobs, job_id).to_status()
+
+
+@router.post("/external/enrich/{job_id}/resume", response_model=EnrichmentJobStatus)
+async def resume_enrichment_job(job_id: str,
+                                session_factory: async_sessionmaker = Depends(get_async_sessionmaker),
+                                service: ExternalAPIService = Depends(get_external_api_service),
+                                jobs: EnrichmentJobManager = Depends(get_enrichment_jobs)):
+    """
+    Resume a cancelled or failed enrichment job from its checkpoint
+    """
+    job = _get_job_or_404(jobs, job_id)
+    if job.status == "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Enrichment job already completed"
+        )
+    jobs.start(job, session_factory, service)
+    return job.to_status()
+
+
+@router.post("/external/enrich/{job_id}/cancel", response_model=EnrichmentJobStatus)
+async def cancel_enrichment_job(job_id: str, jobs: EnrichmentJobManager = Depends(get_enrichment_jobs)):
+    """
+    Cancel a running enrichment job; it can be resumed later
+    """
+    job = _get_job_or_404(jobs, job_id)
+    await jobs.cancel(job)
+    return job.to_status()
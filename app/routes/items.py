@@ -1,96 +1,495 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, insert, update, delete, func, type_coerce, literal_column, and_, or_, table, column
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.database import get_async_db, get_async_sessionmaker, get_read_db
 from app.models.item_model import Item
-from app.schemas.item_schema import ItemCreate, ItemUpdate, ItemResponse
-import requests
-import os
+from app.schemas.item_schema import (
+    ItemCreate, ItemUpdate, ItemResponse, ItemPage, ItemSearchResult, ItemSearchPage,
+    ItemBulkUpdate, ItemBulkDelete,
+    BulkItemError, BulkItemResponse, BulkDeleteResponse, ImportResult
+)
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.item_io import EXPORT_MEDIA_TYPES, ImportAborted, stream_items, import_items, format_validation_error
+from app.utils.item_cache import ItemCache, get_item_cache
+from app.utils.etag import etag_versions, is_not_modified, validator_headers
+from app.utils.json_response import FastJSONResponse, json_bytes_response
+from app.utils.write_behind import ExternalDataWriteBehind, get_external_data_writes
+from datetime import datetime
+import re
+from typing import Any, List, Optional
 
 router = APIRouter()
 
+items_table = Item.__table__
+
+# Upper bound on rows accepted by a single bulk request
+MAX_BULK_ITEMS = 5000
+
+# Page size limits for the list endpoint
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+async def _get_item_or_404(db: AsyncSession, item_id: int) -> Item:
+    result = await db.execute(select(Item).where(Item.id == item_id))
+    db_item = result.scalar_one_or_none()
+    if not db_item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Item not found"
+        )
+    return db_item
+
+
+async def _get_item_version(db: AsyncSession, cache: ItemCache, item_id: int) -> datetime:
+    """
+    Look up only an item's updated_at (from the cache if present) for conditional requests
+    """
+    cached = await cache.get(item_id, route="get_item_version")
+    if cached is not None:
+        return datetime.fromisoformat(cached["updated_at"])
+    updated_at = await db.scalar(select(Item.updated_at).where(Item.id == item_id))
+    if updated_at is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Item not found"
+        )
+    return updated_at
+
+
+def _serialize_item(db_item: Item) -> dict:
+    """
+    JSON-compatible form of an item, as stored in the item cache
+    """
+    return ItemResponse.model_validate(db_item).model_dump(mode="json")
+
+
+def _external_data_matches(db: AsyncSession, key: str, value: Any):
+    """
+    Filter on a top-level external_data key. On PostgreSQL this is a JSONB
+    containment test served by the GIN index; other backends use json_extract.
+    """
+    if db.bind.dialect.name == "postgresql":
+        return type_coerce(Item.external_data, JSONB).contains({key: value})
+    return func.json_extract(Item.external_data, f"$.{key}") == value
+
+
+def _search_query(db: AsyncSession, q: str):
+    """
+    Build the full-text match for q and its rank expression (higher is better).
+    PostgreSQL matches the GIN-indexed search_vector column with
+    websearch_to_tsquery; SQLite matches the items_fts FTS5 table and ranks by bm25.
+    Returns None when q contains no searchable terms.
+    """
+    if db.bind.dialect.name == "postgresql":
+        tsquery = func.websearch_to_tsquery(literal_column("'english'::regconfig"), q)
+        vector = literal_column("items.search_vector")
+        rank = func.ts_rank_cd(vector, tsquery)
+        return select(items_table, rank.label("rank")).where(vector.op("@@")(tsquery)), rank
+
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    # Quote every term so user input can't inject FTS5 query syntax
+    match = " ".join('"' + term + '"' for term in terms)
+    fts = table("items_fts", column("rowid"))
+    rank = -func.bm25(literal_column("items_fts"))
+    query = (
+        select(items_table, rank.label("rank"))
+        .join(fts, fts.c.rowid == Item.id)
+        .where(literal_column("items_fts").op("MATCH")(match))
+    )
+    return query, rank
+
+
+def _check_bulk_size(rows: List[Any]) -> None:
+    if len(rows) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Bulk requests are limited to {MAX_BULK_ITEMS} items"
+        )
+
+
 @router.post("/items", response_model=ItemResponse, status_code=status.HTTP_201_CREATED)
-def create_item(item: ItemCreate, db: Session = Depends(get_db)):
+async def create_item(item: ItemCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new item in the database
     """
     try:
-        db_item = Item(
-            title=item.title,
-            description=item.description
+        # INSERT ... RETURNING: one round trip, no follow-up SELECT
+        result = await db.execute(
+            insert(items_table).values(title=item.title, description=item.description).returning(items_table)
         )
-        db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
+        db_item = result.one()
+        await db.commit()
         return db_item
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating item: {str(e)}"
         )
 
 
-@router.get("/items/{item_id}", response_model=ItemResponse)
-def get_item(item_id: int, db: Session = Depends(get_db)):
+@router.get("/items", response_model=ItemPage)
+async def list_items(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    title: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+    external_user_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
     """
-    Get an item by ID
+    List items ordered by ID using keyset pagination.
+    Pass the returned next_cursor to fetch the following page; each page is an
+    index range scan (WHERE id > last_id ORDER BY id LIMIT n), so latency does
+    not grow with the page number.
+    """
+    query = select(Item).order_by(Item.id).limit(limit + 1)
+
+    if cursor is not None:
+        try:
+            last_id = int(decode_cursor(cursor)["id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.where(Item.id > last_id)
+    if title is not None:
+        query = query.where(Item.title == title)
+    if title_prefix is not None:
+        query = query.where(Item.title.startswith(title_prefix, autoescape=True))
+    if external_user_id is not None:
+        query = query.where(_external_data_matches(db, "userId", external_user_id))
+
+    result = await db.scalars(query)
+    items = result.all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor({"id": items[-1].id})
+    return json_bytes_response(ItemPage(items=items, next_cursor=next_cursor).model_dump_json().encode())
+
+
+@router.get("/items/search", response_model=ItemSearchPage)
+async def search_items(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Full-text search over item title and description, best matches first.
+    Pages are keyed on (rank, id); pass next_cursor to continue.
     """
-    item = db.query(Item).filter(Item.id == item_id).first()
-    if not item:
+    search = _search_query(db, q)
+    if search is None:
+        return ItemSearchPage(items=[])
+    query, rank = search
+
+    if cursor is not None:
+        try:
+            values = decode_cursor(cursor)
+            last_rank, last_id = float(values["rank"]), int(values["id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.where(or_(rank < last_rank, and_(rank == last_rank, Item.id > last_id)))
+
+    result = await db.execute(query.order_by(rank.desc(), Item.id).limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"rank": rows[-1].rank, "id": rows[-1].id})
+    # Rows carry the item columns plus rank, so they validate into the result model directly
+    items = [ItemSearchResult.model_validate(row) for row in rows]
+    return json_bytes_response(ItemSearchPage(items=items, next_cursor=next_cursor).model_dump_json().encode())
+
+
+@router.get("/items/export", response_class=StreamingResponse)
+def export_items(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    session_factory: async_sessionmaker = Depends(get_async_sessionmaker)
+):
+    """
+    Stream every item as NDJSON or CSV.
+    The export reads through a server-side cursor in its own session and never
+    materializes the table, so memory use does not depend on the row count.
+    """
+    return StreamingResponse(
+        stream_items(session_factory, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=items.{format}"}
+    )
+
+
+@router.post("/items/import", response_model=ImportResult)
+async def import_items_stream(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Import items from an NDJSON or CSV request body.
+    The body is read as a stream, validated row by row and loaded in batches
+    (COPY on PostgreSQL), so large files never have to fit in memory.
+    Batches are committed as they fill; on failure the 500 detail carries
+    the partial result, whose imported count is how many rows were loaded.
+    """
+    try:
+        return await import_items(db, request.stream(), format)
+    except ImportAborted as e:
+        await db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item not found"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": f"Error importing items: {str(e)}", **e.result.model_dump(mode="json")}
         )
-    return item
 
 
-@router.put("/items/{item_id}", response_model=ItemResponse)
-def update_item(item_id: int, item_update: ItemUpdate, db: Session = Depends(get_db)):
+@router.post("/items/bulk", response_model=BulkItemResponse)
+async def create_items_bulk(items: List[Any] = Body(...), db: AsyncSession = Depends(get_async_db)):
     """
-    Update an item by ID
+    Create many items in a single transaction.
+    Rows that fail validation are reported in errors and the rest are inserted
+    with one multi-row INSERT ... RETURNING.
     """
-    db_item = db.query(Item).filter(Item.id == item_id).first()
-    if not db_item:
+    _check_bulk_size(items)
+    errors = []
+    rows = []
+    for index, raw in enumerate(items):
+        try:
+            item = ItemCreate.model_validate(raw)
+        except ValidationError as e:
+            errors.append(BulkItemError(index=index, error=format_validation_error(e)))
+            continue
+        rows.append({"title": item.title, "description": item.description})
+
+    created = []
+    if rows:
+        try:
+            result = await db.scalars(insert(Item).returning(Item, sort_by_parameter_order=True), rows)
+            created = result.all()
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error creating items: {str(e)}"
+            )
+
+    return BulkItemResponse(items=created, errors=errors)
+
+
+@router.patch("/items/bulk", response_model=BulkItemResponse)
+async def update_items_bulk(items: List[Any] = Body(...), db: AsyncSession = Depends(get_async_db),
+                            cache: ItemCache = Depends(get_item_cache)):
+    """
+    Update many items by ID in a single transaction.
+    Invalid rows, duplicate IDs and unknown IDs are reported in errors; the
+    rest are written with one executemany UPDATE.
+    """
+    _check_bulk_size(items)
+    errors = []
+    updates = {}
+    for index, raw in enumerate(items):
+        try:
+            item = ItemBulkUpdate.model_validate(raw)
+        except ValidationError as e:
+            errors.append(BulkItemError(index=index, error=format_validation_error(e)))
+            continue
+        if item.id in updates:
+            errors.append(BulkItemError(index=index, id=item.id, error="Duplicate item id in request"))
+            continue
+        updates[item.id] = (index, item)
+
+    updated = []
+    if updates:
+        try:
+            result = await db.scalars(select(Item.id).where(Item.id.in_(updates.keys())))
+            existing = set(result.all())
+            for item_id, (index, item) in updates.items():
+                if item_id not in existing:
+                    errors.append(BulkItemError(index=index, id=item_id, error="Item not found"))
+
+            now = datetime.utcnow()
+            rows = [
+                {"id": item_id, "title": item.title, "description": item.description, "updated_at": now}
+                for item_id, (index, item) in updates.items() if item_id in existing
+            ]
+            if rows:
+                await db.execute(update(Item), rows)
+                result = await db.scalars(select(Item).where(Item.id.in_(existing)).order_by(Item.id))
+                updated = result.all()
+            await db.commit()
+            await cache.invalidate_many(existing)
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error updating items: {str(e)}"
+            )
+
+    errors.sort(key=lambda error: error.index)
+    return BulkItemResponse(items=updated, errors=errors)
+
+
+@router.delete("/items/bulk", response_model=BulkDeleteResponse)
+async def delete_items_bulk(payload: ItemBulkDelete, db: AsyncSession = Depends(get_async_db),
+                            cache: ItemCache = Depends(get_item_cache)):
+    """
+    Delete many items by ID with a single DELETE ... RETURNING.
+    IDs that do not exist are reported in errors.
+    """
+    _check_bulk_size(payload.ids)
+    try:
+        result = await db.scalars(delete(Item).where(Item.id.in_(payload.ids)).returning(Item.id))
+        deleted = set(result.all())
+        await db.commit()
+        await cache.invalidate_many(deleted)
+    except Exception as e:
+        await db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item not found"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error deleting items: {str(e)}"
         )
-    
+
+    errors = [
+        BulkItemError(index=index, id=item_id, error="Item not found")
+        for index, item_id in enumerate(payload.ids) if item_id not in deleted
+    ]
+    return BulkDeleteResponse(deleted=sorted(deleted), errors=errors)
+
+
+@router.get("/items/cache/stats")
+def get_item_cache_stats(cache: ItemCache = Depends(get_item_cache)):
+    """
+    Get item cache size, evictions and per-route hit ratios
+    """
+    return cache.stats()
+
+
+@router.get("/items/{item_id}", response_model=ItemResponse)
+async def get_item(item_id: int, request: Request,
+                   db: AsyncSession = Depends(get_async_db),
+                   cache: ItemCache = Depends(get_item_cache)):
+    """
+    Get an item by ID
+    Reads through the item cache; the database is only queried on a miss.
+    Misses read the primary, not a replica, so a lagging replica cannot put
+    an old or deleted row back into the cache after an invalidation.
+    Responses carry ETag / Last-Modified; conditional requests are answered
+    with 304 from a version lookup without loading the full row.
+    """
+    headers = request.headers
+    if "if-none-match" in headers or "if-modified-since" in headers:
+        updated_at = await _get_item_version(db, cache, item_id)
+        if is_not_modified(headers, item_id, updated_at):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(item_id, updated_at))
+
+    payload = await cache.get(item_id, route="get_item")
+    if payload is None:
+        since = cache.sequence()
+        payload = _serialize_item(await _get_item_or_404(db, item_id))
+        # Dropped if a PUT / DELETE touched the item while this row was read
+        await cache.fill(item_id, payload, since)
+
+    # The payload is already JSON-compatible, so encode it directly instead of
+    # re-validating it against ItemResponse
+    return FastJSONResponse(payload, headers=validator_headers(item_id, datetime.fromisoformat(payload["updated_at"])))
+
+
+@router.put("/items/{item_id}", response_model=ItemResponse)
+async def update_item(item_id: int, item_update: ItemUpdate, response: Response,
+                      if_match: Optional[str] = Header(None),
+                      db: AsyncSession = Depends(get_async_db),
+                      cache: ItemCache = Depends(get_item_cache),
+                      writes: ExternalDataWriteBehind = Depends(get_external_data_writes)):
+    """
+    Update an item by ID
+    Runs as a single UPDATE ... RETURNING. With If-Match, the update only
+    applies if the item's current ETag matches (optimistic concurrency);
+    otherwise 412 is returned. A queued external_data write for the item is
+    flushed first, since the ETag it returned is not in the database yet;
+    if that flush fails, 503 is returned.
+    """
+    query = (
+        update(items_table)
+        .where(items_table.c.id == item_id)
+        .values(title=item_update.title, description=item_update.description, updated_at=datetime.utcnow())
+        .returning(items_table)
+    )
+    if if_match is not None:
+        versions = etag_versions(if_match, item_id)
+        if versions is not None:
+            if not await writes.flush_item(item_id):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="A queued write for this item could not be saved; retry later"
+                )
+            query = query.where(items_table.c.updated_at.in_(versions))
+
     try:
-        db_item.title = item_update.title
-        db_item.description = item_update.description
-        
-        db.commit()
-        db.refresh(db_item)
-        return db_item
+        result = await db.execute(query)
+        db_item = result.one_or_none()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating item: {str(e)}"
         )
 
+    if db_item is None:
+        # Zero rows matched: tell a missing item apart from a failed precondition
+        exists = if_match is not None and await db.scalar(select(items_table.c.id).where(items_table.c.id == item_id))
+        if exists:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Item has been modified"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Item not found"
+        )
+
+    payload = _serialize_item(db_item)
+    await cache.set(item_id, payload)
+    response.headers.update(validator_headers(item_id, db_item.updated_at))
+    return payload
+
 
 @router.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_item(item_id: int, db: Session = Depends(get_db)):
+async def delete_item(item_id: int, db: AsyncSession = Depends(get_async_db),
+                      cache: ItemCache = Depends(get_item_cache)):
     """
     Delete an item by ID
+    Runs as a single DELETE ... RETURNING.
     """
-    db_item = db.query(Item).filter(Item.id == item_id).first()
-    if not db_item:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Item not found"
-        )
-    
     try:
-        db.delete(db_item)
-        db.commit()
+        deleted_id = await db.scalar(delete(items_table).where(items_table.c.id == item_id).returning(items_table.c.id))
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting item: {str(e)}"
         )
-    
-    return {"message": "Item deleted successfully"}
\ No newline at end of file
+
+    if deleted_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Item not found"
+        )
+
+    await cache.invalidate(item_id)
+    return {"message": "Item deleted successfully"}
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 from typing import List
 
 
@@ -19,7 +19,7 @@ class ItemUpdate(ItemBase):
 
 class ItemResponse(ItemBase):
     id: int
-    external_data: Optional[str] = None
+    external_data: Optional[Any] = None
     created_at: datetime
     updated_at: datetime
 
@@ -27,6 +27,72 @@ class ItemResponse(ItemBase):
         from_attributes = True
 
 
+class ItemPage(BaseModel):
+    items: List[ItemResponse]
+    next_cursor: Optional[str] = None
+
+
+class ItemSearchResult(ItemResponse):
+    rank: float
+
+
+class ItemSearchPage(BaseModel):
+    items: List[ItemSearchResult]
+    next_cursor: Optional[str] = None
+
+
+class ItemBulkUpdate(ItemUpdate):
+    id: int
+
+
+class ItemBulkDelete(BaseModel):
+    ids: List[int]
+
+
+class BulkItemError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: str
+
+
+class BulkItemResponse(BaseModel):
+    items: List[ItemResponse] = []
+    errors: List[BulkItemError] = []
+
+
+class BulkDeleteResponse(BaseModel):
+    deleted: List[int] = []
+    errors: List[BulkItemError] = []
+
+
+class ImportResult(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[BulkItemError] = []
+
+
+class EnrichmentJobCreate(BaseModel):
+    item_ids: Optional[List[int]] = None
+    title_prefix: Optional[str] = None
+    only_missing: bool = False
+    after_id: int = 0
+    concurrency: int = Field(10, ge=1, le=100)
+
+
+class EnrichmentJobStatus(BaseModel):
+    id: str
+    status: str
+    total: int
+    processed: int
+    succeeded: int
+    failed: int
+    last_item_id: int
+    failed_item_ids: List[int] = []
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 class ExternalApiResponse(BaseModel):
     id: int
     title: str
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import time
+
+
+class CacheEntry:
+    """
+    A cached value with its freshness deadlines (monotonic seconds) and the
+    upstream validators (ETag / Last-Modified) used to revalidate it
+    """
+    __slots__ = ("value", "expires_at", "stale_until", "etag", "last_modified")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float,
+                 etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (time.monotonic() if now is None else now) < self.expires_at
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with per-entry TTL and LRU eviction.
+
+    Entries past their TTL are kept for a further stale_ttl seconds so callers
+    can serve them while refreshing in the background (stale-while-revalidate).
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 60.0, stale_ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Return the entry for key (fresh or stale), or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        if now >= entry.stale_until:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if entry.is_fresh(now):
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Return the stored entry for key without touching recency or counters
+        """
+        return self._entries.get(key)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """
+        Store value under key, evicting least recently used entries when full
+        """
+        now = time.monotonic()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = CacheEntry(value, expires_at, expires_at + self.stale_ttl, etag, last_modified)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Async forms of get / peek / set, matching DiskCache's; nothing here blocks
+
+    async def get_async(self, key: Hashable) -> Optional[CacheEntry]:
+        return self.get(key)
+
+    async def peek_async(self, key: Hashable) -> Optional[CacheEntry]:
+        return self.peek(key)
+
+    async def set_async(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+                        etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        self.set(key, value, ttl, etag=etag, last_modified=last_modified)
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
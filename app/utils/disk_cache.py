@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional
+from app.utils.cache import CacheEntry, TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Recency is written back at most this often per entry, so hits stay read-only
+ACCESS_WRITE_INTERVAL = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at);
+"""
+
+
+class DiskCache:
+    """
+    Persistent drop-in for TTLCache backed by a SQLite file, so cached upstream
+    responses survive restarts and are shared by every worker on the host.
+
+    The file is opened in WAL mode with a short busy timeout, so several
+    processes can read and write it at once; each process (and each fork)
+    opens its own connection. A lookup or write that still finds the file
+    locked is treated as a miss or skipped. Entries are capped at max_entries
+    with least-recently-used eviction. Rows past their stale window are no
+    longer served but are kept until evicted, so their ETag / Last-Modified
+    can still be used to revalidate them (see peek). Decoded entries (fresh
+    or stale) are also kept in a small in-process cache to avoid re-reading
+    hot keys.
+
+    The *_async methods run the SQLite calls in a worker thread so they never
+    block the event loop; memory hits return without leaving it.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, default_ttl: float = 60.0,
+                 stale_ttl: float = 300.0, memory_entries: int = 256, busy_timeout: float = 1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.busy_timeout = busy_timeout
+        self._memory = TTLCache(max_entries=memory_entries, stale_ttl=0)
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # A connection must not be shared with a forked child (e.g. preloaded workers)
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"), default=str)
+
+    @staticmethod
+    def _entry(row: tuple) -> CacheEntry:
+        # Stored deadlines are wall-clock; CacheEntry works in monotonic time
+        value, etag, last_modified, expires_at, stale_until = row
+        offset = time.monotonic() - time.time()
+        return CacheEntry(json.loads(value), expires_at + offset, stale_until + offset, etag, last_modified)
+
+    def _read(self, key: str) -> Optional[tuple]:
+        return self._conn().execute(
+            "SELECT value, etag, last_modified, expires_at, stale_until, accessed_at FROM entries WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Read key's entry from disk; None if missing, past its stale window or locked
+        """
+        disk_key = self._key(key)
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._read(disk_key)
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Disk cache read failed, treating as a miss: {str(e)}")
+                return None
+            if row is None or now >= row[4]:
+                return None
+            if now - row[5] > ACCESS_WRITE_INTERVAL:
+                try:
+                    self._conn().execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, disk_key))
+                except sqlite3.OperationalError:
+                    pass
+        return self._entry(row[:5])
+
+    def _count(self, entry: CacheEntry) -> CacheEntry:
+        if entry.is_fresh():
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    def _cached(self, key: Hashable) -> Optional[CacheEntry]:
+        memory_entry = self._memory.get(key)
+        return self._count(memory_entry.value) if memory_entry is not None else None
+
+    def _remember(self, key: Hashable, entry: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        # Kept in memory until its stale window ends, so stale hits skip the disk too
+        if entry is None:
+            self.misses += 1
+            return None
+        self._memory.set(key, entry, entry.stale_until - time.monotonic())
+        return self._count(entry)
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Return the entry for key (fresh or stale), or None on a miss
+        """
+        entry = self._cached(key)
+        if entry is not None:
+            return entry
+        return self._remember(key, self._load(key))
+
+    async def get_async(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._cached(key)
+        if entry is not None:
+            return entry
+        return self._remember(key, await asyncio.to_thread(self._load, key))
+
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Return the stored entry for key even past its stale window, without
+        touching recency or counters
+        """
+        with self._lock:
+            try:
+                row = self._read(self._key(key))
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Disk cache read failed, treating as a miss: {str(e)}")
+                return None
+        return self._entry(row[:5]) if row is not None else None
+
+    async def peek_async(self, key: Hashable) -> Optional[CacheEntry]:
+        return await asyncio.to_thread(self.peek, key)
+
+    def _write(self, key: Hashable, value: Any, ttl: Optional[float],
+               etag: Optional[str], last_modified: Optional[str]) -> int:
+        """
+        Upsert the row and evict past max_entries; returns the number evicted
+        """
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        encoded = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            try:
+                connection = self._conn()
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, etag, last_modified, expires_at, stale_until, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self._key(key), encoded, etag, last_modified, expires_at, expires_at + self.stale_ttl, now),
+                )
+                return connection.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Disk cache write skipped: {str(e)}")
+                return 0
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """
+        Store value under key, evicting least recently used entries when full
+        """
+        self.evictions += self._write(key, value, ttl, etag, last_modified)
+        self._memory.delete(key)
+
+    async def set_async(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+                        etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        self.evictions += await asyncio.to_thread(self._write, key, value, ttl, etag, last_modified)
+        self._memory.delete(key)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._conn().execute("DELETE FROM entries WHERE key = ?", (self._key(key),))
+        self._memory.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn().execute("DELETE FROM entries")
+        self._memory.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
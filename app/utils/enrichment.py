@@ -0,0 +1,265 @@
+import asyncio
+import bisect
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.database.instrumentation import request_query_stats
+from app.models.item_model import Item
+from app.schemas.item_schema import EnrichmentJobCreate, EnrichmentJobStatus
+from app.utils.external_api_service import ExternalAPIService
+from app.utils.item_cache import ItemCache, item_cache
+
+logger = logging.getLogger(__name__)
+
+# Items fetched and written back per batch; the checkpoint advances once per batch
+ENRICHMENT_BATCH_SIZE = 200
+
+# Failed item ids kept on the job for reporting
+MAX_REPORTED_FAILURES = 100
+
+# Finished jobs are kept for polling this long, and at most this many jobs overall
+FINISHED_JOB_TTL = 3600.0
+MAX_JOBS = 1000
+
+
+class EnrichmentJob:
+    """
+    A batch enrichment run over a set of items, processed in ascending id order.
+    last_item_id is the checkpoint: every item up to it has been handled, so
+    the job can resume from there after a cancel or failure (or be re-submitted
+    with after_id after a restart).
+    """
+
+    def __init__(self, request: EnrichmentJobCreate):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.item_ids = sorted(set(request.item_ids)) if request.item_ids is not None else None
+        self.status = "pending"
+        self.total = 0
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.last_item_id = request.after_id
+        self.failed_item_ids: List[int] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def _filters(self) -> list:
+        filters = [Item.id > self.last_item_id]
+        if self.request.title_prefix is not None:
+            filters.append(Item.title.startswith(self.request.title_prefix, autoescape=True))
+        if self.request.only_missing:
+            filters.append(Item.external_data.is_(None))
+        return filters
+
+    def _next_candidates(self) -> Optional[List[int]]:
+        """
+        Next slice of requested ids after the checkpoint (None when ids come from a filter)
+        """
+        if self.item_ids is None:
+            return None
+        start = bisect.bisect_right(self.item_ids, self.last_item_id)
+        return self.item_ids[start:start + ENRICHMENT_BATCH_SIZE]
+
+    def to_status(self) -> EnrichmentJobStatus:
+        return EnrichmentJobStatus(
+            id=self.id,
+            status=self.status,
+            total=self.total,
+            processed=self.processed,
+            succeeded=self.succeeded,
+            failed=self.failed,
+            last_item_id=self.last_item_id,
+            failed_item_ids=self.failed_item_ids,
+            error=self.error,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+        )
+
+
+class EnrichmentJobManager:
+    """
+    Runs enrichment jobs as background tasks and keeps their progress in memory.
+    Upstream calls go through ExternalAPIService (and its per-host token bucket)
+    with at most job.concurrency in flight; results are written back with one
+    executemany UPDATE per batch.
+
+    Finished jobs stay available for FINISHED_JOB_TTL seconds; beyond
+    MAX_JOBS, the oldest finished jobs are dropped first. Running jobs are
+    never dropped.
+    """
+
+    def __init__(self, cache: Optional[ItemCache] = None, finished_job_ttl: float = FINISHED_JOB_TTL,
+                 max_jobs: int = MAX_JOBS):
+        self.jobs: Dict[str, EnrichmentJob] = {}
+        self.cache = cache if cache is not None else item_cache
+        self.finished_job_ttl = finished_job_ttl
+        self.max_jobs = max_jobs
+
+    def get(self, job_id: str) -> Optional[EnrichmentJob]:
+        return self.jobs.get(job_id)
+
+    def submit(self, request: EnrichmentJobCreate, session_factory: async_sessionmaker,
+               service: ExternalAPIService) -> EnrichmentJob:
+        self._prune()
+        job = EnrichmentJob(request)
+        self.jobs[job.id] = job
+        self.start(job, session_factory, service)
+        return job
+
+    def start(self, job: EnrichmentJob, session_factory: async_sessionmaker,
+              service: ExternalAPIService) -> None:
+        """
+        Start (or resume from its checkpoint) a job that is not already running
+        """
+        if job.task is not None and not job.task.done():
+            return
+        job.status = "running"
+        job.error = None
+        job.finished_at = None
+        job.task = asyncio.create_task(self._run(job, session_factory, service))
+
+    async def cancel(self, job: EnrichmentJob) -> None:
+        """
+        Cancel a running job and wait for it to stop at its checkpoint
+        """
+        if job.task is None or job.task.done():
+            return
+        job.task.cancel()
+        await asyncio.gather(job.task, return_exceptions=True)
+        # A task cancelled before it started never ran _run's handlers
+        if job.status == "running":
+            job.status = "cancelled"
+            job.finished_at = datetime.utcnow()
+
+    def _prune(self) -> None:
+        """
+        Drop finished jobs past finished_job_ttl, then the oldest finished
+        ones while more than max_jobs are kept
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.finished_job_ttl)
+        finished = sorted(
+            (job for job in self.jobs.values() if job.finished_at is not None),
+            key=lambda job: job.finished_at,
+        )
+        excess = len(self.jobs) - self.max_jobs + 1
+        for job in finished:
+            if job.finished_at >= cutoff and excess <= 0:
+                break
+            del self.jobs[job.id]
+            excess -= 1
+
+    async def shutdown(self) -> None:
+        """
+        Cancel running jobs; their checkpoints stay available for resume
+        """
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: EnrichmentJob, session_factory: async_sessionmaker,
+                   service: ExternalAPIService) -> None:
+        # The task inherits the submitting request's context; its queries
+        # must not count towards that request
+        request_query_stats.set(None)
+        try:
+            if job.total == 0:
+                async with session_factory() as session:
+                    job.total = await self._count(job, session)
+
+            while True:
+                # Each batch uses short-lived sessions so no pooled connection
+                # is held while the upstream calls are in flight
+                async with session_factory() as session:
+                    item_ids = await self._next_batch(job, session)
+                if not item_ids:
+                    break
+                results = await self._fetch_batch(job, service, item_ids)
+
+                now = datetime.utcnow()
+                rows = [
+                    {"id": item_id, "external_data": data, "updated_at": now}
+                    for item_id, data in results if data is not None
+                ]
+                if rows:
+                    async with session_factory() as session:
+                        await session.execute(update(Item), rows)
+                        await session.commit()
+                    await self.cache.invalidate_many(row["id"] for row in rows)
+
+                for item_id, data in results:
+                    if data is None:
+                        job.failed += 1
+                        if len(job.failed_item_ids) < MAX_REPORTED_FAILURES:
+                            job.failed_item_ids.append(item_id)
+                job.succeeded += len(rows)
+                job.processed += len(results)
+                job.last_item_id = item_ids[-1]
+
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Enrichment job {job.id} failed after item {job.last_item_id}: {str(e)}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    async def _count(self, job: EnrichmentJob, session) -> int:
+        query = select(func.count()).select_from(Item).where(*job._filters())
+        if job.item_ids is not None:
+            # Counted per slice to stay under the driver's bind-parameter limit
+            total = 0
+            for start in range(0, len(job.item_ids), ENRICHMENT_BATCH_SIZE):
+                chunk = job.item_ids[start:start + ENRICHMENT_BATCH_SIZE]
+                total += await session.scalar(query.where(Item.id.in_(chunk)))
+            return total
+        return await session.scalar(query)
+
+    async def _next_batch(self, job: EnrichmentJob, session) -> List[int]:
+        query = select(Item.id).where(*job._filters()).order_by(Item.id)
+        candidates = job._next_candidates()
+        while candidates is not None:
+            if not candidates:
+                return []
+            item_ids = (await session.scalars(query.where(Item.id.in_(candidates)))).all()
+            if item_ids:
+                return list(item_ids)
+            # None of these requested ids exist (or match); skip past them
+            job.last_item_id = candidates[-1]
+            candidates = job._next_candidates()
+        return list((await session.scalars(query.limit(ENRICHMENT_BATCH_SIZE))).all())
+
+    async def _fetch_batch(self, job: EnrichmentJob, service: ExternalAPIService,
+                           item_ids: List[int]) -> List[Tuple[int, Optional[dict]]]:
+        semaphore = asyncio.Semaphore(job.request.concurrency)
+
+        async def fetch(item_id: int) -> Tuple[int, Optional[dict]]:
+            async with semaphore:
+                return item_id, await service.make_async_request(f"posts/{item_id}")
+
+        tasks = [asyncio.create_task(fetch(item_id)) for item_id in item_ids]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            # A failed fetch (or a cancel) must not leave the rest of the batch running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+# Shared job manager; running jobs are cancelled in main.py's lifespan
+enrichment_jobs = EnrichmentJobManager()
+
+
+def get_enrichment_jobs() -> EnrichmentJobManager:
+    return enrichment_jobs
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC (datetime.utcnow)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def item_etag(item_id: int, updated_at: datetime) -> str:
+    """
+    Strong ETag for an item version, derived from its id and updated_at
+    """
+    micros = (_as_utc(updated_at) - EPOCH) // timedelta(microseconds=1)
+    return f'"{item_id}-{micros}"'
+
+
+def etag_versions(header: str, item_id: int) -> Optional[List[datetime]]:
+    """
+    Decode the updated_at values named by an If-Match header for item_id, so the
+    precondition can be checked inside the UPDATE itself. Returns None for "*"
+    (any version); weak or foreign ETags are ignored, as If-Match compares strongly.
+    """
+    versions = []
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return None
+        tag_id, _, micros = candidate.strip('"').partition("-")
+        if candidate.startswith('"') and tag_id == str(item_id) and micros.isdigit():
+            versions.append((EPOCH + timedelta(microseconds=int(micros))).replace(tzinfo=None))
+    return versions
+
+
+def validator_headers(item_id: int, updated_at: datetime) -> Dict[str, str]:
+    return {
+        "ETag": item_etag(item_id, updated_at),
+        "Last-Modified": format_datetime(_as_utc(updated_at).replace(microsecond=0), usegmt=True),
+    }
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    """
+    Check an If-Match / If-None-Match header value against etag.
+    If-None-Match uses weak comparison (a W/ prefix is ignored); If-Match uses strong comparison.
+    """
+    if header is None:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(headers: Mapping[str, str], item_id: int, updated_at: datetime) -> bool:
+    """
+    Evaluate If-None-Match (preferred) or If-Modified-Since for a conditional GET
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, item_etag(item_id, updated_at), weak=True)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        return _as_utc(updated_at).replace(microsecond=0) <= since
+    return False
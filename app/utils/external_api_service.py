@@ -1,112 +1,532 @@
 import requests
+from requests.adapters import HTTPAdapter
 import asyncio
 import aiohttp
-from typing import Optional, Dict, Any
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from typing import Optional, Dict, Any, Hashable, Tuple, Union
+from urllib.parse import urlsplit
 import logging
+import os
+import random
+import time
+from app.utils.cache import CacheEntry, TTLCache
+from app.utils.disk_cache import DiskCache
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.metrics import EXTERNAL_API_DURATION, EXTERNAL_API_REQUESTS
+from app.utils.rate_limit import HostRateLimiter
+from app.utils.single_flight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upstream statuses worth retrying; other errors are returned immediately
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given as delay-seconds or an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class UpstreamResponse:
+    """
+    A successful upstream GET: status 200 with a parsed body, or 304 (body None)
+    after a conditional request, plus the response's validators
+    """
+    __slots__ = ("status", "body", "etag", "last_modified")
+
+    def __init__(self, status: int, body: Any, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.status = status
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
 class ExternalAPIService:
     """
     Service class to handle external API calls with proper error handling, 
-    timeouts, and retry mechanisms
+    timeouts, and retry mechanisms.
+
+    Connections are pooled: the async path shares one aiohttp.ClientSession
+    (keep-alive, per-host limits, DNS cache) opened by start() and released
+    by close(), and the sync path shares one requests.Session.
+
+    GET responses can be served from an in-process TTL/LRU cache through
+    get_cached(); cache_ttls maps endpoint patterns (fnmatch style, e.g.
+    "posts/*") to a TTL in seconds. Concurrent identical GETs are coalesced
+    into one upstream call. The cache can be a persistent DiskCache; entries
+    keep the upstream ETag / Last-Modified, and expired ones are revalidated
+    with a conditional GET, so unchanged resources cost a 304.
+
+    Each upstream host gets a circuit breaker and, when rate_limit_per_host
+    is set, a token bucket. Retries use jittered exponential backoff (or the
+    upstream's Retry-After) and stop once the deadline budget for the call
+    is spent.
     """
     
-    def __init__(self, base_url: str, timeout: int = 10, max_retries: int = 3):
+    def __init__(self, base_url: str, timeout: int = 10, max_retries: int = 3,
+                 pool_limit: int = 100, pool_limit_per_host: int = 20,
+                 dns_cache_ttl: int = 300, keepalive_timeout: int = 30,
+                 cache: Optional[Union[TTLCache, DiskCache]] = None,
+                 cache_ttls: Optional[Dict[str, float]] = None,
+                 rate_limit_per_host: Optional[float] = None,
+                 breaker_failure_threshold: int = 5,
+                 breaker_recovery_timeout: float = 30.0,
+                 backoff_base: float = 0.5, backoff_max: float = 10.0,
+                 deadline: float = 30.0):
         self.base_url = base_url
         self.timeout = timeout
         self.max_retries = max_retries
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.cache = cache if cache is not None else TTLCache()
+        self.cache_ttls = cache_ttls or {}
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self.revalidated = 0
+        self.flight = SingleFlight()
+        self.rate_limiter = HostRateLimiter(rate_limit_per_host) if rate_limit_per_host else None
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_recovery_timeout = breaker_recovery_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_limit_per_host, pool_maxsize=pool_limit_per_host)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+
+    async def start(self) -> None:
+        """
+        Open the shared async connection pool
+        """
+        self._get_session()
+
+    async def close(self) -> None:
+        """
+        Close the shared connection pools
+        """
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+        self._http.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the shared ClientSession, creating it on first use.
+        A session is bound to the event loop it was created on, so a new one
+        is opened if the running loop has changed (e.g. between test clients).
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._session_loop = loop
+        return self._session
     
+    def breaker(self, host: str) -> CircuitBreaker:
+        """
+        Circuit breaker for an upstream host, created on first use
+        """
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(self.breaker_failure_threshold, self.breaker_recovery_timeout)
+        return self._breakers[host]
+
+    def breaker_stats(self) -> Dict[str, Any]:
+        return {host: breaker.stats() for host, breaker in self._breakers.items()}
+
+    def _check_breaker(self, host: str) -> CircuitBreaker:
+        breaker = self.breaker(host)
+        if not breaker.allow_request():
+            EXTERNAL_API_REQUESTS.labels(host, "circuit_open").inc()
+            raise CircuitOpenError(host, breaker.retry_after())
+        return breaker
+
+    @staticmethod
+    def _record_attempt(host: str, outcome: str, started: float) -> None:
+        EXTERNAL_API_REQUESTS.labels(host, outcome).inc()
+        EXTERNAL_API_DURATION.labels(host).observe(time.perf_counter() - started)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """
+        Delay before the next attempt: the upstream's Retry-After when given,
+        otherwise exponential backoff with full jitter
+        """
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
     def make_request(self, endpoint: str, method: str = "GET", 
                      headers: Optional[Dict] = None, 
                      params: Optional[Dict] = None, 
                      data: Optional[Dict] = None) -> Optional[Dict]:
         """
-        Make a synchronous request to the external API
+        Make a synchronous request to the external API.
+        Raises CircuitOpenError while the host's circuit breaker is open.
         """
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        
+        host = urlsplit(url).netloc
+        breaker = self._check_breaker(host)
+        healthy: Optional[bool] = False
+        try:
+            result, healthy = self._send_request(url, host, method, headers, params, data)
+        finally:
+            if healthy:
+                breaker.record_success()
+            elif healthy is None:
+                breaker.record_skipped()
+            else:
+                breaker.record_failure()
+        return result
+
+    def _send_request(self, url: str, host: str, method: str,
+                      headers: Optional[Dict],
+                      params: Optional[Dict],
+                      data: Optional[Dict]) -> Tuple[Optional[Dict], Optional[bool]]:
+        """
+        Retry loop for make_request. Returns the parsed body (or None) and
+        whether the upstream answered without a retryable failure (None when
+        no call was made because the rate limit outlasted the deadline).
+        """
+        deadline = time.monotonic() + self.deadline
+
         for attempt in range(self.max_retries):
+            retry_after = None
+            started = time.perf_counter()
             try:
-                response = requests.request(
+                if self.rate_limiter is not None:
+                    bucket = self.rate_limiter.bucket(host)
+                    while not bucket.try_acquire():
+                        wait = bucket.wait_time()
+                        if time.monotonic() + wait >= deadline:
+                            logger.error(f"Deadline exceeded waiting for a rate limit token for {host}")
+                            return None, None
+                        time.sleep(wait)
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                started = time.perf_counter()
+                response = self._http.request(
                     method=method,
                     url=url,
                     headers=headers,
                     params=params,
                     json=data,
-                    timeout=self.timeout
+                    timeout=min(self.timeout, remaining)
                 )
                 
                 if response.status_code in [200, 201]:
-                    return response.json()
-                elif response.status_code == 429:  # Rate limited
-                    logger.warning(f"Rate limited on attempt {attempt + 1}, retrying...")
-                    continue
+                    self._record_attempt(host, "success", started)
+                    return response.json(), True
+                elif response.status_code in RETRYABLE_STATUSES:
+                    self._record_attempt(host, "retryable_status", started)
+                    logger.warning(f"Request failed with status {response.status_code} on attempt {attempt + 1}")
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
                 else:
+                    self._record_attempt(host, "error_status", started)
                     logger.error(f"Request failed with status {response.status_code}: {response.text}")
-                    if attempt == self.max_retries - 1:
-                        return None
+                    return None, True
                         
             except requests.exceptions.Timeout:
+                self._record_attempt(host, "timeout", started)
                 logger.error(f"Request timed out on attempt {attempt + 1}")
-                if attempt == self.max_retries - 1:
-                    return None
             except requests.exceptions.ConnectionError:
+                self._record_attempt(host, "connection_error", started)
                 logger.error(f"Connection error on attempt {attempt + 1}")
-                if attempt == self.max_retries - 1:
-                    return None
             except requests.exceptions.RequestException as e:
+                self._record_attempt(host, "error", started)
                 logger.error(f"Request error on attempt {attempt + 1}: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    return None
+
+            if attempt < self.max_retries - 1:
+                delay = self._retry_delay(attempt, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    logger.error(f"Deadline exceeded after attempt {attempt + 1}")
+                    break
+                time.sleep(delay)
         
-        return None
+        return None, False
 
     async def make_async_request(self, endpoint: str, method: str = "GET", 
                                 headers: Optional[Dict] = None, 
                                 params: Optional[Dict] = None, 
                                 data: Optional[Dict] = None) -> Optional[Dict]:
         """
-        Make an asynchronous request to the external API
+        Make an asynchronous request to the external API.
+        Concurrent identical GET requests (same URL and params) share one
+        upstream call through the single-flight layer.
+        Raises CircuitOpenError while the host's circuit breaker is open.
         """
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         
+        if method.upper() == "GET" and data is None:
+            key = (method.upper(), url, tuple(sorted((params or {}).items())))
+            return await self.flight.do(
+                key, lambda: self._send_async_request(url, method, headers, params, data)
+            )
+        return await self._send_async_request(url, method, headers, params, data)
+
+    async def _send_async_request(self, url: str, method: str,
+                                  headers: Optional[Dict],
+                                  params: Optional[Dict],
+                                  data: Optional[Dict]) -> Optional[Dict]:
+        """
+        Send one request to the external API and return its parsed body
+        """
+        response = await self._exchange(url, method, headers, params, data)
+        return response.body if response is not None else None
+
+    async def _exchange(self, url: str, method: str,
+                        headers: Optional[Dict],
+                        params: Optional[Dict],
+                        data: Optional[Dict]) -> Optional[UpstreamResponse]:
+        """
+        Send one request to the external API through the host's circuit breaker
+        """
+        host = urlsplit(url).netloc
+        breaker = self._check_breaker(host)
+        healthy: Optional[bool] = False
+        try:
+            result, healthy = await self._send_async_attempts(url, host, method, headers, params, data)
+        finally:
+            if healthy:
+                breaker.record_success()
+            elif healthy is None:
+                breaker.record_skipped()
+            else:
+                breaker.record_failure()
+        return result
+
+    async def _send_async_attempts(self, url: str, host: str, method: str,
+                                   headers: Optional[Dict],
+                                   params: Optional[Dict],
+                                   data: Optional[Dict]) -> Tuple[Optional[UpstreamResponse], Optional[bool]]:
+        """
+        Retry loop for the async path. Returns the response (or None) and
+        whether the upstream answered without a retryable failure (None when
+        no call was made because the rate limit outlasted the deadline).
+        """
+        deadline = time.monotonic() + self.deadline
+
         for attempt in range(self.max_retries):
+            retry_after = None
+            started = time.perf_counter()
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.request(
-                        method=method,
-                        url=url,
-                        headers=headers,
-                        params=params,
-                        json=data,
-                        timeout=aiohttp.ClientTimeout(total=self.timeout)
-                    ) as response:
-                        
-                        if response.status == 200:
-                            return await response.json()
-                        elif response.status == 429:  # Rate limited
-                            logger.warning(f"Rate limited on attempt {attempt + 1}, retrying...")
-                            await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                            continue
-                        else:
-                            logger.error(f"Request failed with status {response.status}: {await response.text()}")
-                            if attempt == self.max_retries - 1:
-                                return None
-                                
+                if self.rate_limiter is not None:
+                    try:
+                        await asyncio.wait_for(self.rate_limiter.acquire(host), deadline - time.monotonic())
+                    except asyncio.TimeoutError:
+                        logger.error(f"Deadline exceeded waiting for a rate limit token for {host}")
+                        return None, None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                started = time.perf_counter()
+                session = self._get_session()
+                async with session.request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    params=params,
+                    json=data,
+                    timeout=aiohttp.ClientTimeout(total=min(self.timeout, remaining))
+                ) as response:
+                    
+                    if response.status == 200:
+                        self._record_attempt(host, "success", started)
+                        body = await response.json()
+                        return UpstreamResponse(200, body, response.headers.get("ETag"),
+                                                response.headers.get("Last-Modified")), True
+                    elif response.status == 304:
+                        self._record_attempt(host, "not_modified", started)
+                        return UpstreamResponse(304, None, response.headers.get("ETag"),
+                                                response.headers.get("Last-Modified")), True
+                    elif response.status in RETRYABLE_STATUSES:
+                        self._record_attempt(host, "retryable_status", started)
+                        logger.warning(f"Request failed with status {response.status} on attempt {attempt + 1}")
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    else:
+                        self._record_attempt(host, "error_status", started)
+                        logger.error(f"Request failed with status {response.status}: {await response.text()}")
+                        return None, True
+                            
             except asyncio.TimeoutError:
+                self._record_attempt(host, "timeout", started)
                 logger.error(f"Request timed out on attempt {attempt + 1}")
-                if attempt == self.max_retries - 1:
-                    return None
             except aiohttp.ClientError as e:
+                self._record_attempt(host, "connection_error", started)
                 logger.error(f"Client error on attempt {attempt + 1}: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    return None
             except Exception as e:
+                self._record_attempt(host, "error", started)
                 logger.error(f"Unexpected error on attempt {attempt + 1}: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    return None
+
+            if attempt < self.max_retries - 1:
+                delay = self._retry_delay(attempt, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    logger.error(f"Deadline exceeded after attempt {attempt + 1}")
+                    break
+                await asyncio.sleep(delay)
         
-        return None
\ No newline at end of file
+        return None, False
+
+    def _cache_ttl(self, endpoint: str) -> Optional[float]:
+        """
+        Return the TTL configured for endpoint, preferring the longest matching pattern
+        """
+        endpoint = endpoint.strip("/")
+        matches = [pattern for pattern in self.cache_ttls if fnmatch(endpoint, pattern)]
+        if not matches:
+            return None
+        return self.cache_ttls[max(matches, key=len)]
+
+    @staticmethod
+    def _cache_key(endpoint: str, params: Optional[Dict]) -> Hashable:
+        return (endpoint.strip("/"), tuple(sorted((params or {}).items())))
+
+    @staticmethod
+    def _conditional_headers(entry: Optional[CacheEntry]) -> Optional[Dict]:
+        if entry is None:
+            return None
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers or None
+
+    async def fetch_resource(self, endpoint: str, params: Optional[Dict] = None,
+                             entry: Optional[CacheEntry] = None) -> Optional[UpstreamResponse]:
+        """
+        GET endpoint, conditionally when entry carries validators (a 304 means
+        entry is still current). Concurrent identical fetches are coalesced;
+        the validators sent are part of the key, so a caller only ever shares
+        a 304 answered for its own entry.
+        """
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        headers = self._conditional_headers(entry)
+        key = ("conditional", url, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+        return await self.flight.do(key, lambda: self._exchange(url, "GET", headers, params, None))
+
+    async def _store(self, key: Hashable, endpoint: str, response: Optional[UpstreamResponse],
+                     previous: Optional[CacheEntry]) -> Optional[Any]:
+        """
+        Cache a fetched (200) or revalidated (304) response and return its value
+        """
+        if response is None:
+            return None
+        if response.status == 304:
+            if previous is None:
+                return None
+            self.revalidated += 1
+            value = previous.value
+            etag = response.etag or previous.etag
+            last_modified = response.last_modified or previous.last_modified
+        else:
+            value, etag, last_modified = response.body, response.etag, response.last_modified
+        await self.cache.set_async(key, value, self._cache_ttl(endpoint), etag=etag, last_modified=last_modified)
+        return value
+
+    async def _refresh(self, key: Hashable, endpoint: str, params: Optional[Dict],
+                       entry: CacheEntry) -> None:
+        """
+        Revalidate a stale entry in the background; keep serving the stale value on failure
+        """
+        try:
+            await self._store(key, endpoint, await self.fetch_resource(endpoint, params, entry), entry)
+        except CircuitOpenError:
+            pass
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get_cached(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Any]:
+        """
+        GET endpoint through the response cache.
+        Fresh hits return immediately, stale hits return the cached value and
+        schedule a background revalidation, misses fetch from upstream
+        (conditionally, when an expired entry with validators is still stored).
+        Failed requests (None) are not cached. Misses raise CircuitOpenError
+        while the upstream's breaker is open.
+        """
+        key = self._cache_key(endpoint, params)
+        entry = await self.cache.get_async(key)
+        if entry is not None:
+            if not entry.is_fresh() and key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(self._refresh(key, endpoint, params, entry))
+            return entry.value
+
+        previous = await self.cache.peek_async(key)
+        response = await self.fetch_resource(endpoint, params, previous)
+        if response is not None and response.status == 304 and previous is None:
+            # Nothing to revalidate against; fetch the full response instead
+            response = await self.fetch_resource(endpoint, params)
+        return await self._store(key, endpoint, response, previous)
+
+
+def _response_cache():
+    """
+    In-process response cache, or a persistent DiskCache shared by all workers
+    when EXTERNAL_API_CACHE_PATH is set
+    """
+    options = {
+        "max_entries": int(os.getenv("EXTERNAL_API_CACHE_MAX_ENTRIES", 1024)),
+        "default_ttl": float(os.getenv("EXTERNAL_API_CACHE_TTL", 60)),
+        "stale_ttl": float(os.getenv("EXTERNAL_API_CACHE_STALE_TTL", 300)),
+    }
+    path = os.getenv("EXTERNAL_API_CACHE_PATH")
+    if path:
+        return DiskCache(path, **options)
+    return TTLCache(**options)
+
+
+# Shared service instance; its connection pool is opened and closed in main.py's lifespan
+external_api_service = ExternalAPIService(
+    base_url=os.getenv("EXTERNAL_API_BASE_URL", "https://jsonplaceholder.typicode.com"),
+    timeout=int(os.getenv("EXTERNAL_API_TIMEOUT", 10)),
+    max_retries=int(os.getenv("EXTERNAL_API_MAX_RETRIES", 3)),
+    pool_limit=int(os.getenv("EXTERNAL_API_POOL_LIMIT", 100)),
+    pool_limit_per_host=int(os.getenv("EXTERNAL_API_POOL_LIMIT_PER_HOST", 20)),
+    cache=_response_cache(),
+    cache_ttls={"posts": 300, "posts/*": 60},
+    rate_limit_per_host=float(os.getenv("EXTERNAL_API_RATE_LIMIT_PER_HOST", 50)) or None,
+    breaker_failure_threshold=int(os.getenv("EXTERNAL_API_BREAKER_FAILURES", 5)),
+    breaker_recovery_timeout=float(os.getenv("EXTERNAL_API_BREAKER_RECOVERY", 30)),
+    deadline=float(os.getenv("EXTERNAL_API_DEADLINE", 30)),
+)
+
+
+def get_external_api_service() -> ExternalAPIService:
+    return external_api_service
@@ -0,0 +1,163 @@
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional
+from app.utils.cache import TTLCache
+
+
+class ItemCacheBackend(ABC):
+    """
+    Storage interface for the item cache. Values are JSON-compatible dicts so
+    a shared backend (e.g. Redis or memcached) can implement this interface and
+    be used by every worker. A backend missing any abstract method cannot be
+    instantiated.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InProcessItemCacheBackend(ItemCacheBackend):
+    """
+    Per-process LRU backend with an entry budget and a TTL.
+    Each worker keeps its own copy, so the TTL bounds how long another worker's
+    write can go unseen.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0):
+        self._cache = TTLCache(max_entries=max_entries, default_ttl=ttl, stale_ttl=0)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        return entry.value if entry is not None else None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._cache.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+class ItemCache:
+    """
+    Read-through cache of serialized items keyed by id, with hit/miss counters
+    per route. Writers call set() or invalidate() after committing.
+
+    Readers fill the cache with fill(), passing the sequence() taken before
+    their SELECT. Every set() / invalidate() is numbered, and a fill is
+    dropped if the item was written since, so a slow reader cannot put an
+    old or deleted row back over a newer write. The last write per item is
+    remembered for up to max_tracked items; past that, fills started before
+    the oldest forgotten write are dropped too. This ordering is per process.
+    """
+
+    def __init__(self, backend: Optional[ItemCacheBackend] = None, enabled: bool = True,
+                 max_tracked: int = 10000):
+        self.backend = backend if backend is not None else InProcessItemCacheBackend()
+        self.enabled = enabled
+        self.max_tracked = max_tracked
+        self._sequence = 0
+        self._written: "OrderedDict[int, int]" = OrderedDict()
+        self._forgotten = 0
+        self.skipped_fills = 0
+        self._route_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    @staticmethod
+    def _key(item_id: int) -> str:
+        return f"item:{item_id}"
+
+    async def get(self, item_id: int, route: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        value = await self.backend.get(self._key(item_id))
+        self._route_stats[route]["hits" if value is not None else "misses"] += 1
+        return value
+
+    def sequence(self) -> int:
+        """
+        Current write sequence; take it before reading a row to fill() with
+        """
+        return self._sequence
+
+    def _record_write(self, item_id: int) -> None:
+        self._sequence += 1
+        self._written[item_id] = self._sequence
+        self._written.move_to_end(item_id)
+        while len(self._written) > self.max_tracked:
+            _, sequence = self._written.popitem(last=False)
+            self._forgotten = max(self._forgotten, sequence)
+
+    async def fill(self, item_id: int, value: Dict[str, Any], since: int) -> bool:
+        """
+        Cache a row read after sequence() returned since, unless the item was
+        written (or may have been) in the meantime; returns whether it was stored
+        """
+        if not self.enabled:
+            return False
+        if self._written.get(item_id, self._forgotten) > since:
+            self.skipped_fills += 1
+            return False
+        await self.backend.set(self._key(item_id), value)
+        return True
+
+    async def set(self, item_id: int, value: Dict[str, Any]) -> None:
+        if self.enabled:
+            self._record_write(item_id)
+            await self.backend.set(self._key(item_id), value)
+
+    async def invalidate(self, item_id: int) -> None:
+        if self.enabled:
+            self._record_write(item_id)
+            await self.backend.delete(self._key(item_id))
+
+    async def invalidate_many(self, item_ids: Iterable[int]) -> None:
+        for item_id in item_ids:
+            await self.invalidate(item_id)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self._route_stats.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route, counts in self._route_stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            routes[route] = {**counts, "hit_ratio": counts["hits"] / lookups if lookups else 0.0}
+        return {"enabled": self.enabled, "backend": self.backend.stats(), "routes": routes,
+                "skipped_fills": self.skipped_fills}
+
+
+# Shared item cache; swap the backend here to share entries between workers
+item_cache = ItemCache(
+    InProcessItemCacheBackend(
+        max_entries=int(os.getenv("ITEM_CACHE_MAX_ENTRIES", 10000)),
+        ttl=float(os.getenv("ITEM_CACHE_TTL", 60)),
+    ),
+    enabled=os.getenv("ITEM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
+
+
+def get_item_cache() -> ItemCache:
+    return item_cache
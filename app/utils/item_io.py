@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.models.item_model import Item
+from app.schemas.item_schema import ItemCreate, BulkItemError, ImportResult
+
+# Columns written by the export, in output order
+EXPORT_COLUMNS = ("id", "title", "description", "external_data", "created_at", "updated_at")
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+# Rows validated and loaded per COPY / INSERT batch (one commit per batch)
+IMPORT_BATCH_SIZE = 1000
+
+# Per-row errors kept in the import result; further failures are only counted
+MAX_IMPORT_ERRORS = 100
+
+# Longest CSV record (in characters) buffered while a quoted field spans lines
+MAX_CSV_RECORD_CHARS = 1024 * 1024
+
+# Bytes read per chunk when importing from a file
+READ_CHUNK_SIZE = 64 * 1024
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class ImportAborted(Exception):
+    """
+    Raised when an import stops part way; result holds the rows already
+    committed (imported) and the per-row errors seen so far
+    """
+
+    def __init__(self, message: str, result: ImportResult):
+        super().__init__(message)
+        self.result = result
+
+
+def format_validation_error(e: ValidationError) -> str:
+    """
+    Flatten a pydantic ValidationError into a one-line per-row message
+    """
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()
+    )
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def rows_to_ndjson(rows: Iterable[Sequence[Any]]) -> bytes:
+    """
+    Encode row tuples (in EXPORT_COLUMNS order) as newline-delimited JSON
+    """
+    return b"".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_default).encode() + b"\n"
+        for row in rows
+    )
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def rows_to_csv(rows: Iterable[Sequence[Any]], header: bool = False) -> bytes:
+    """
+    Encode row tuples (in EXPORT_COLUMNS order) as CSV
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_items(session_factory: async_sessionmaker, fmt: str) -> AsyncIterator[bytes]:
+    """
+    Yield the whole items table as NDJSON or CSV chunks.
+    Rows come from a server-side cursor in EXPORT_BATCH_SIZE partitions and are
+    encoded straight from the row tuples, so memory stays flat with table size.
+    """
+    encode = rows_to_csv if fmt == "csv" else rows_to_ndjson
+    if fmt == "csv":
+        yield rows_to_csv([], header=True)
+
+    async with session_factory() as session:
+        columns = [getattr(Item, column) for column in EXPORT_COLUMNS]
+        result = await session.stream(
+            select(*columns).order_by(Item.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            yield encode(partition)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a stream of byte chunks into decoded lines without buffering the whole body
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+_CSV_SPECIAL = re.compile(r'[",]')
+
+
+def _ends_in_quoted_field(line: str, in_quotes: bool) -> bool:
+    """
+    Whether a CSV record is still inside a quoted field after line, given
+    whether it was before it. Follows the csv module's default dialect: a
+    quote only opens a field at its start, and "" inside one is a literal.
+    """
+    field_start = -1 if in_quotes else 0
+    escaped_at = -1
+    for match in _CSV_SPECIAL.finditer(line):
+        position = match.start()
+        if position == escaped_at:
+            continue
+        if in_quotes:
+            if match.group() == '"':
+                if line.startswith('"', position + 1):
+                    escaped_at = position + 1
+                else:
+                    in_quotes = False
+        elif match.group() == ",":
+            field_start = position + 1
+        elif position == field_start:
+            in_quotes = True
+    return in_quotes
+
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (index, record) pairs from NDJSON or CSV lines. Records that can't be
+    parsed are yielded as the ValueError describing the problem.
+    CSV records may span lines inside quoted fields; the first record is the header.
+    A record still open after MAX_CSV_RECORD_CHARS (e.g. an unterminated
+    quote) is reported as an error and dropped, so memory stays bounded.
+    """
+    index = 0
+    header: Optional[List[str]] = None
+    buffered: List[str] = []
+    buffered_chars = 0
+    in_quotes = False
+    async for line in lines:
+        if fmt == "csv":
+            buffered.append(line)
+            buffered_chars += len(line) + 1
+            in_quotes = _ends_in_quoted_field(line, in_quotes)
+            if in_quotes:
+                if buffered_chars <= MAX_CSV_RECORD_CHARS:
+                    continue
+                yield index, ValueError(f"CSV record exceeds {MAX_CSV_RECORD_CHARS} characters (unterminated quoted field?)")
+                buffered, buffered_chars, in_quotes = [], 0, False
+                index += 1
+                continue
+            record_text = "\n".join(buffered)
+            buffered, buffered_chars = [], 0
+            if not record_text.strip():
+                continue
+            row = next(csv.reader([record_text]))
+            if header is None:
+                header = row
+                continue
+            # Empty CSV cells mean "no value", matching how the export writes NULLs
+            yield index, {key: (value if value != "" else None) for key, value in zip(header, row)}
+        else:
+            if not line.strip():
+                continue
+            try:
+                yield index, json.loads(line)
+            except ValueError as e:
+                yield index, ValueError(f"Invalid JSON: {e}")
+        index += 1
+    if buffered:
+        yield index, ValueError("CSV record ends inside a quoted field")
+
+
+async def load_rows(session: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    """
+    Load validated rows with PostgreSQL COPY when running on asyncpg, falling
+    back to a batched multi-row INSERT for other drivers (e.g. SQLite in tests)
+    """
+    now = datetime.utcnow()
+    if session.bind.dialect.driver == "asyncpg":
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Item.__tablename__,
+            records=[(row["title"], row["description"], now, now) for row in rows],
+            columns=["title", "description", "created_at", "updated_at"],
+        )
+    else:
+        await session.execute(
+            insert(Item),
+            [{"title": row["title"], "description": row["description"], "created_at": now, "updated_at": now} for row in rows]
+        )
+
+
+async def import_items(session: AsyncSession, chunks: AsyncIterator[bytes], fmt: str) -> ImportResult:
+    """
+    Stream NDJSON or CSV items into the database.
+    Rows are validated against ItemCreate and loaded in IMPORT_BATCH_SIZE
+    batches, each committed on its own, so memory stays bounded by the batch
+    size regardless of the input size. Raises ImportAborted if loading
+    fails; batches committed before that stay loaded.
+    """
+    result = ImportResult()
+    batch: List[Dict[str, Any]] = []
+
+    async def flush() -> None:
+        await load_rows(session, batch)
+        await session.commit()
+        result.imported += len(batch)
+        batch.clear()
+
+    try:
+        async for index, record in iter_records(iter_lines(chunks), fmt):
+            error = None
+            if isinstance(record, ValueError):
+                error = str(record)
+            else:
+                try:
+                    item = ItemCreate.model_validate(record)
+                    batch.append({"title": item.title, "description": item.description})
+                except ValidationError as e:
+                    error = format_validation_error(e)
+            if error is not None:
+                result.failed += 1
+                if len(result.errors) < MAX_IMPORT_ERRORS:
+                    result.errors.append(BulkItemError(index=index, error=error))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+
+        if batch:
+            await flush()
+    except Exception as e:
+        raise ImportAborted(str(e), result) from e
+    return result
+
+
+async def _read_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def _run_cli(args: argparse.Namespace) -> None:
+    from app.database import AsyncSessionLocal, async_engine
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    try:
+        if args.command == "import":
+            async with AsyncSessionLocal() as session:
+                try:
+                    result = await import_items(session, _read_file(args.path), fmt)
+                except ImportAborted as e:
+                    print(e.result.model_dump_json(indent=2))
+                    raise SystemExit(f"Import failed: {str(e)}")
+            print(result.model_dump_json(indent=2))
+        else:
+            with open(args.path, "wb") as f:
+                async for chunk in stream_items(AsyncSessionLocal, fmt):
+                    f.write(chunk)
+    finally:
+        await async_engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command line entry point (see items_cli.py): {import,export} PATH [--format ndjson|csv]
+    """
+    parser = argparse.ArgumentParser(description="Bulk import or export items")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None,
+                        help="File format (defaults to csv for *.csv paths, ndjson otherwise)")
+    args = parser.parse_args(argv)
+    asyncio.run(_run_cli(args))
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+from typing import Any, Optional
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode JSON-compatible content (datetimes allowed) straight to bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_json_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when it is installed.
+    Used as the app's default response class.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_bytes_response(body: bytes, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """
+    Response for a body that is already encoded JSON, e.g. from
+    model_dump_json / TypeAdapter.dump_json, bypassing jsonable_encoder
+    """
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
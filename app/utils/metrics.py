@@ -0,0 +1,108 @@
+import os
+import time
+from typing import List
+from fastapi.responses import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+
+# Label used for requests that did not match an API route (404s, docs, static)
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, until the response body is sent", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled", ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Database statement execution time", ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+EXTERNAL_API_REQUESTS = Counter(
+    "external_api_requests_total", "Upstream API attempts by outcome", ["host", "outcome"]
+)
+EXTERNAL_API_DURATION = Histogram(
+    "external_api_request_duration_seconds", "Upstream API attempt latency", ["host"]
+)
+
+WRITE_BEHIND_QUEUE_DEPTH = Gauge(
+    "write_behind_queue_depth", "external_data writes waiting to be flushed", multiprocess_mode="livesum"
+)
+WRITE_BEHIND_FLUSH_DURATION = Histogram(
+    "write_behind_flush_duration_seconds", "Time to write one batch of queued external_data updates"
+)
+WRITE_BEHIND_ROWS = Counter(
+    "write_behind_rows_flushed_total", "Queued external_data updates written to the database"
+)
+
+
+# Custom collectors (read at scrape time), also added to multiprocess scrapes
+_collectors: List = []
+
+
+def register_collector(collector) -> None:
+    REGISTRY.register(collector)
+    _collectors.append(collector)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request counts, latency and in-flight
+    requests. Requests are labelled with the matched route template (e.g.
+    /api/v1/items/{item_id}) rather than the raw path, which keeps label
+    cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            # The router stores the matched APIRoute on the (shared) scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            HTTP_REQUESTS.labels(method, route_path, str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(duration)
+
+
+def metrics_response() -> Response:
+    """
+    Current metrics in the Prometheus text exposition format.
+    With PROMETHEUS_MULTIPROC_DIR set (multi-worker launcher) counters and
+    histograms are summed over all workers; custom collectors such as the
+    pool gauges still describe the worker that served the scrape.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _collectors:
+            registry.register(collector)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
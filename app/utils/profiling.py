@@ -0,0 +1,98 @@
+import asyncio
+import cProfile
+import hmac
+import logging
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # pyinstrument is optional; fall back to the stdlib deterministic profiler
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+# Request header carrying the profiling token
+PROFILE_HEADER = "x-profile"
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that profiles a single request on demand.
+
+    A request whose X-Profile header equals the configured token is run under
+    pyinstrument (sampling, async-aware: only the request's own task and the
+    tasks it spawns are sampled) and the profile is written to directory in
+    speedscope format, which speedscope.app renders as a flamegraph. Without
+    pyinstrument, cProfile is used and a .prof file is written (open with
+    snakeviz or flameprof); cProfile sees every task on the event loop thread.
+    The file name is returned in an X-Profile-File header.
+
+    Only one request is profiled at a time. main.py installs the middleware
+    only when PROFILE_TOKEN is set, so it costs nothing otherwise.
+    """
+
+    def __init__(self, app, token: str, directory: str = "profiles", interval: float = 0.001):
+        self.app = app
+        self.token = token.encode()
+        self.directory = Path(directory)
+        self.interval = interval
+        self._active = False
+
+    def _requested(self, scope) -> bool:
+        supplied = Headers(scope=scope).get(PROFILE_HEADER)
+        return supplied is not None and hmac.compare_digest(supplied.encode(), self.token)
+
+    def _profile_path(self, scope) -> Path:
+        route = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        suffix = "speedscope.json" if Profiler is not None else "prof"
+        return self.directory / f"{timestamp}-{scope['method']}-{route}-{uuid.uuid4().hex[:8]}.{suffix}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        path = self._profile_path(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-File", path.name)
+            await send(message)
+
+        self._active = True
+        try:
+            profiler, stop = self._start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                stop()
+                await asyncio.to_thread(self._write, profiler, path)
+        finally:
+            self._active = False
+
+    def _start(self) -> Tuple[Any, Callable[[], Any]]:
+        if Profiler is not None:
+            profiler = Profiler(interval=self.interval, async_mode="enabled")
+            profiler.start()
+            return profiler, profiler.stop
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, profiler.disable
+
+    def _write(self, profiler, path: Path) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if Profiler is not None:
+                path.write_text(profiler.output(renderer=SpeedscopeRenderer()))
+            else:
+                profiler.dump_stats(str(path))
+            logger.info(f"Wrote request profile to {path}")
+        except Exception as e:
+            logger.error(f"Failed to write request profile {path}: {str(e)}")
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import bindparam, case, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.database import AsyncSessionLocal
+from app.models.item_model import Item
+from app.utils.item_cache import ItemCache, item_cache
+from app.utils.metrics import WRITE_BEHIND_FLUSH_DURATION, WRITE_BEHIND_QUEUE_DEPTH, WRITE_BEHIND_ROWS
+
+logger = logging.getLogger(__name__)
+
+items_table = Item.__table__
+
+# One statement executed for the whole batch (executemany). updated_at never
+# moves backwards, in case the item was edited after the write was queued.
+FLUSH_STATEMENT = (
+    update(items_table)
+    .where(items_table.c.id == bindparam("b_id"))
+    .values(
+        external_data=bindparam("b_external_data", type_=items_table.c.external_data.type),
+        updated_at=case(
+            (items_table.c.updated_at > bindparam("b_updated_at", type_=items_table.c.updated_at.type),
+             items_table.c.updated_at),
+            else_=bindparam("b_updated_at", type_=items_table.c.updated_at.type),
+        ),
+    )
+)
+
+
+class ExternalDataWriteBehind:
+    """
+    Write-behind queue for Item.external_data updates.
+
+    Writes are held in memory, deduplicated by item id (last write wins) and
+    flushed by a background task as one batched UPDATE when max_batch items
+    are pending or flush_interval seconds after the first pending write.
+    Flushed items are invalidated in the item cache. A failed flush is
+    requeued (newer writes still win) and retried after flush_interval.
+
+    submit() returns False when the queue is not running or is full, and the
+    caller then writes directly. A queued write's new updated_at is already
+    visible through the item cache, so conditional writes call flush_item()
+    first to commit it before comparing versions. Pending writes are drained
+    by stop(), which main.py's lifespan calls on shutdown; writes still
+    pending when a process dies are lost.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, cache: ItemCache, max_batch: int = 500,
+                 flush_interval: float = 0.05, max_pending: int = 10000, enabled: bool = True):
+        self.session_factory = session_factory
+        self.cache = cache
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self.running = False
+        self._pending: Dict[int, Tuple[Any, datetime]] = {}
+        # Batch currently being written; flushes run one at a time
+        self._flushing: Dict[int, Tuple[Any, datetime]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_rows = 0
+        self.last_flush_ms = 0.0
+
+    async def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop accepting writes and flush everything still pending
+        """
+        self.running = False
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self._pending and not await self.flush():
+            logger.error(f"Dropped {len(self._pending)} pending external_data writes on shutdown")
+
+    def submit(self, item_id: int, external_data: Any, updated_at: datetime) -> bool:
+        """
+        Queue a write; False means it was not accepted and must be written directly
+        """
+        if not self.running:
+            return False
+        if item_id in self._pending:
+            self.coalesced += 1
+        elif len(self._pending) >= self.max_pending:
+            return False
+        self._pending[item_id] = (external_data, updated_at)
+        self.submitted += 1
+        WRITE_BEHIND_QUEUE_DEPTH.set(len(self._pending))
+        if self._wakeup is not None and (len(self._pending) == 1 or len(self._pending) >= self.max_batch):
+            self._wakeup.set()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.running and len(self._pending) < self.max_batch:
+                # Give the batch up to flush_interval to fill
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            flushed = await self.flush()
+            if not self.running:
+                return
+            if self._pending:
+                if not flushed:
+                    await asyncio.sleep(self.flush_interval)
+                self._wakeup.set()
+
+    async def flush_item(self, item_id: int) -> bool:
+        """
+        Make sure any queued write for item_id is committed, waiting for an
+        in-progress flush or flushing the queue; returns False if that failed
+        """
+        if item_id not in self._pending and item_id not in self._flushing:
+            return True
+        await self.flush()
+        return item_id not in self._pending
+
+    async def flush(self) -> bool:
+        """
+        Write all pending updates now; returns False if the flush failed
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            self._flushing, self._pending = self._pending, {}
+            try:
+                return await self._write(self._flushing)
+            finally:
+                self._flushing = {}
+
+    async def _write(self, batch: Dict[int, Tuple[Any, datetime]]) -> bool:
+        rows = [
+            {"b_id": item_id, "b_external_data": external_data, "b_updated_at": updated_at}
+            for item_id, (external_data, updated_at) in batch.items()
+        ]
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as session:
+                for start in range(0, len(rows), self.max_batch):
+                    await session.execute(FLUSH_STATEMENT, rows[start:start + self.max_batch])
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Flushing {len(rows)} external_data writes failed: {str(e)}")
+            for item_id, write in batch.items():
+                self._pending.setdefault(item_id, write)
+            self.failed_flushes += 1
+            WRITE_BEHIND_QUEUE_DEPTH.set(len(self._pending))
+            return False
+
+        duration = time.perf_counter() - started
+        await self.cache.invalidate_many(batch)
+        self.flushes += 1
+        self.flushed_rows += len(rows)
+        self.last_flush_ms = duration * 1000
+        WRITE_BEHIND_FLUSH_DURATION.observe(duration)
+        WRITE_BEHIND_ROWS.inc(len(rows))
+        WRITE_BEHIND_QUEUE_DEPTH.set(len(self._pending))
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "queue_depth": len(self._pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "flushed_rows": self.flushed_rows,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+# Shared queue for fetch-data writes; started and drained in main.py's lifespan
+external_data_writes = ExternalDataWriteBehind(
+    AsyncSessionLocal,
+    item_cache,
+    max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", 500)),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_MS", 50)) / 1000,
+    max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", 10000)),
+    enabled=os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes"),
+)
+
+
+def get_external_data_writes() -> ExternalDataWriteBehind:
+    return external_data_writes
@@ -0,0 +1,83 @@
+"""
+Compare FastAPI's default response pipeline with the fast JSON paths used by
+GET /api/v1/items/{id}, GET /api/v1/items and GET /api/v1/external/posts.
+
+    python benchmarks/bench_serialization.py [--number 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from app.schemas.item_schema import ExternalApiResponse, ItemPage, ItemResponse
+from app.utils.json_response import FastJSONResponse, json_bytes_response
+
+
+def _item(item_id: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "id": item_id,
+        "title": f"Item {item_id}",
+        "description": "Lorem ipsum dolor sit amet " * 4,
+        "external_data": {"userId": 1, "id": item_id, "title": "sunt aut facere", "body": "quia et suscipit " * 8},
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _default_response(adapter: TypeAdapter, value) -> bytes:
+    # What FastAPI does for a response_model: validate, encode, render with json.dumps
+    validated = adapter.validate_python(value, from_attributes=True)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    item = _item(1)
+    cached_payload = ItemResponse.model_validate(item).model_dump(mode="json")
+    page = ItemPage(items=[ItemResponse.model_validate(_item(i)) for i in range(50)], next_cursor="abc")
+    posts = [{"userId": 1, "id": i, "title": "sunt aut facere", "body": "quia et suscipit " * 8} for i in range(100)]
+    item_adapter = TypeAdapter(ItemResponse)
+    page_adapter = TypeAdapter(ItemPage)
+    posts_adapter = TypeAdapter(List[ExternalApiResponse])
+
+    cases = {
+        "get_item": (
+            lambda: _default_response(item_adapter, cached_payload),
+            lambda: FastJSONResponse(cached_payload).body,
+        ),
+        "list_items": (
+            lambda: _default_response(page_adapter, page),
+            lambda: json_bytes_response(page.model_dump_json().encode()).body,
+        ),
+        "external_posts": (
+            lambda: _default_response(posts_adapter, [ExternalApiResponse(**post) for post in posts[:5]]),
+            lambda: json_bytes_response(posts_adapter.dump_json(posts_adapter.validate_python(posts[:5]))).body,
+        ),
+    }
+
+    results = {}
+    for name, (default, fast) in cases.items():
+        default_us = timeit.timeit(default, number=args.number) / args.number * 1e6
+        fast_us = timeit.timeit(fast, number=args.number) / args.number * 1e6
+        results[name] = {
+            "default_us": round(default_us, 2),
+            "fast_us": round(fast_us, 2),
+            "speedup": round(default_us / fast_us, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Compare two run_load.py result files, e.g. from two commits.
+
+    python benchmarks/compare.py baseline.json results.json
+"""
+import argparse
+import json
+from typing import Dict, Optional, Tuple
+
+
+def _load(path: str) -> Tuple[dict, Dict[Tuple[str, int], dict]]:
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {(result["scenario"], result["concurrency"]): result for result in report["results"]}
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if not before or after is None:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    baseline_meta, baseline = _load(args.baseline)
+    candidate_meta, candidate = _load(args.candidate)
+    print(f"baseline {baseline_meta.get('commit')}  vs  candidate {candidate_meta.get('commit')}")
+    print(f"{'scenario':>15} {'conc':>5} {'req/s':>10} {'change':>8} {'p95 ms':>9} {'change':>8} {'p99 ms':>9} {'change':>8}")
+
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key], candidate[key]
+        before_latency, after_latency = before.get("latency_ms", {}), after.get("latency_ms", {})
+        print(
+            f"{key[0]:>15} {key[1]:>5} {after['throughput_rps']:>10} "
+            f"{_change(before['throughput_rps'], after['throughput_rps']):>8} "
+            f"{after_latency.get('p95', '-'):>9} {_change(before_latency.get('p95'), after_latency.get('p95')):>8} "
+            f"{after_latency.get('p99', '-'):>9} {_change(before_latency.get('p99'), after_latency.get('p99')):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Local stand-in for the JSONPlaceholder API with configurable latency and
+failure rate. Serves GET /posts and GET /posts/{id} with ETag and
+Last-Modified validators, answering matching conditional requests with 304.
+
+    python benchmarks/fake_upstream.py --port 9000 --latency-ms 50 --jitter-ms 10
+    EXTERNAL_API_BASE_URL=http://127.0.0.1:9000 uvicorn main:app
+"""
+import argparse
+import asyncio
+import random
+from typing import Tuple
+from aiohttp import web
+
+# Request/error counters of a running fake upstream: app[STATS_KEY]
+STATS_KEY = web.AppKey("stats", dict)
+
+
+def _post(post_id: int) -> dict:
+    return {
+        "userId": (post_id - 1) // 10 + 1,
+        "id": post_id,
+        "title": f"post {post_id}",
+        "body": "quia et suscipit suscipit recusandae consequuntur expedita et cum " * 3,
+    }
+
+
+def create_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+               post_count: int = 100) -> web.Application:
+    """
+    Build the fake upstream. Each response waits latency_ms +/- jitter_ms;
+    error_rate is the fraction of requests answered with 503. Posts beyond
+    post_count return 404, like JSONPlaceholder.
+    """
+    posts = [_post(post_id) for post_id in range(1, post_count + 1)]
+    stats = {"requests": 0, "errors": 0, "not_modified": 0}
+    last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    def respond(request: web.Request, body, etag: str) -> web.Response:
+        headers = {"ETag": etag, "Last-Modified": last_modified}
+        if_none_match = request.headers.get("If-None-Match")
+        if (if_none_match == etag
+                or if_none_match is None and request.headers.get("If-Modified-Since") == last_modified):
+            stats["not_modified"] += 1
+            return web.Response(status=304, headers=headers)
+        return web.json_response(body, headers=headers)
+
+    async def delay() -> bool:
+        stats["requests"] += 1
+        wait = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if wait > 0:
+            await asyncio.sleep(wait / 1000)
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return False
+        return True
+
+    async def list_posts(request: web.Request) -> web.Response:
+        if not await delay():
+            return web.json_response({}, status=503)
+        return respond(request, posts, '"posts-v1"')
+
+    async def get_post(request: web.Request) -> web.Response:
+        if not await delay():
+            return web.json_response({}, status=503)
+        post_id = int(request.match_info["post_id"])
+        if not 1 <= post_id <= post_count:
+            return web.json_response({}, status=404)
+        return respond(request, posts[post_id - 1], f'"post-{post_id}-v1"')
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app[STATS_KEY] = stats
+    app.router.add_get("/posts", list_posts)
+    app.router.add_get(r"/posts/{post_id:\d+}", get_post)
+    app.router.add_get("/_stats", get_stats)
+    return app
+
+
+async def start_server(app: web.Application, host: str = "127.0.0.1",
+                       port: int = 0) -> Tuple[web.AppRunner, int]:
+    """
+    Start app in the running event loop; port 0 picks a free port.
+    Returns the runner (call cleanup() to stop) and the bound port.
+    """
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake JSONPlaceholder upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--post-count", type=int, default=100)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.post_count)
+    web.run_app(app, host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Production launcher: N uvicorn workers under gunicorn.
+
+    gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app) and forked, so workers
+share its memory copy-on-write. Tables are created once in the master, the
+DB connection budget is divided across workers, and /metrics aggregates all
+workers. For a rolling restart, send HUP (or TERM to a single worker):
+in-flight requests get graceful_timeout seconds to finish. For a code deploy
+with zero downtime, use USR2 then WINCH/QUIT on the old master.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# Read .env before any setting below (main.py loads it too late for them)
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    """
+    Integer setting from the environment; unset or empty values use the default
+    """
+    value = os.getenv(name, "").strip()
+    return int(value) if value else default
+
+
+wsgi_app = "main:app"
+bind = f"0.0.0.0:{_env_int('PORT', 8000)}"
+workers = _env_int("WEB_CONCURRENCY", multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+graceful_timeout = _env_int("GRACEFUL_TIMEOUT", 30)
+timeout = _env_int("WORKER_TIMEOUT", 60)
+keepalive = _env_int("KEEPALIVE", 5)
+# Recycle workers after this many requests (0 disables)
+max_requests = _env_int("MAX_REQUESTS", 0)
+max_requests_jitter = _env_int("MAX_REQUESTS_JITTER", 0)
+
+# Everything below runs before the app is preloaded, so database.py and
+# prometheus_client see these settings when they are imported
+
+# Split the DB connection budget (e.g. Postgres max_connections minus
+# headroom) across workers; each worker's pool is fixed at its share
+connection_budget = _env_int("DB_CONNECTION_BUDGET", 0)
+if connection_budget:
+    os.environ["DB_POOL_SIZE"] = str(max(1, connection_budget // workers))
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+
+# Tables are created once in when_ready instead of in every worker's lifespan
+os.environ["CREATE_TABLES_ON_STARTUP"] = "false"
+
+# Metrics are kept in per-process files so any worker can serve the totals
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+else:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+
+def when_ready(server):
+    import asyncio
+    import gc
+    from main import create_tables
+    from app.database import engine
+
+    asyncio.run(create_tables())
+    # Workers must not inherit the master's open connections
+    engine.dispose()
+    # Keep the preloaded objects out of the children's garbage collections,
+    # which would otherwise touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app.database import engine, async_engine, read_replicas
+
+    # Drop any pooled connections copied from the master without closing them
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    for replica in read_replicas.engines:
+        replica.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,14 @@
+"""
+Bulk import/export of items from the command line.
+
+    python items_cli.py import items.ndjson
+    python items_cli.py export items.csv --format csv
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import sys
+from app.utils.item_io import main
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -4,14 +4,25 @@ load_dotenv()
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
+from app.database import engine, async_engine, read_replicas
 from app.routes import items, external_api
+from app.utils.external_api_service import external_api_service
+from app.utils.enrichment import enrichment_jobs
+from app.utils.write_behind import external_data_writes
+from app.utils.json_response import FastJSONResponse
+from app.utils.metrics import MetricsMiddleware, metrics_response, register_collector
+from app.database.instrumentation import PoolStatsCollector, QueryStatsMiddleware
+from app.utils.profiling import ProfilingMiddleware
 import uvicorn
 import os
 
 # Import models
 from app.models import item_model
 
+# Tables are created on startup unless a launcher already did it once
+# (gunicorn.conf.py sets CREATE_TABLES_ON_STARTUP=false)
+CREATE_TABLES_ON_STARTUP = os.getenv("CREATE_TABLES_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
 # Create tables function (will be called on startup)
 async def create_tables():
     from app.database import engine
@@ -19,14 +30,23 @@ async def create_tables():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await create_tables()
+    if CREATE_TABLES_ON_STARTUP:
+        await create_tables()
+    await external_api_service.start()
+    await external_data_writes.start()
     yield
+    await enrichment_jobs.shutdown()
+    await external_data_writes.stop()
+    await external_api_service.close()
+    await async_engine.dispose()
+    await read_replicas.dispose()
 
 app = FastAPI(
     title="Python Backend Engineer Take Home Assessment API",
     description="A robust REST API service using FastAPI and PostgreSQL that acts as a bridge between a local database and an external API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -38,6 +58,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# On-demand profiling of requests sent with "X-Profile: <PROFILE_TOKEN>";
+# not installed at all unless a token is configured
+if os.getenv("PROFILE_TOKEN"):
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=os.getenv("PROFILE_TOKEN"),
+        directory=os.getenv("PROFILE_DIR", "profiles"),
+    )
+
+# Per-request query count / DB time (Server-Timing) and the N+1 guard
+app.add_middleware(QueryStatsMiddleware)
+
+# Request metrics; added last so it wraps every other middleware
+app.add_middleware(MetricsMiddleware)
+
+# Connection pool gauges are read from the engines at scrape time
+register_collector(PoolStatsCollector({
+    "sync": engine,
+    "async": async_engine.sync_engine,
+    **{f"replica{index}": replica.sync_engine for index, replica in enumerate(read_replicas.engines)},
+}))
+
 # Include routes
 app.include_router(items.router, prefix="/api/v1", tags=["items"])
 app.include_router(external_api.router, prefix="/api/v1", tags=["external"])
@@ -46,6 +88,13 @@ app.include_router(external_api.router, prefix="/api/v1", tags=["external"])
 def read_root():
     return {"message": "Welcome to the Python Backend Engineer Take Home Assessment API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint
+    """
+    return metrics_response()
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -1,10 +1,18 @@
+import csv
+import io
+import json
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from app.main import app
-from app.database.database import Base, get_db
+from sqlalchemy.pool import NullPool
+from main import app
+from app.database.database import Base, get_db, get_async_db, get_async_sessionmaker, get_read_db
+from app.database import instrumentation
 from app.models.item_model import Item
+from app.utils.external_api_service import get_external_api_service
+from app.utils.item_cache import ItemCache, get_item_cache
 
 # Create a test database in memory
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -12,6 +20,14 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine on the same file; NullPool because TestClient may run each request on a new event loop
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Instrument the test engines like the app's, for Server-Timing and the query limit
+instrumentation.instrument_engine(engine)
+instrumentation.instrument_engine(async_engine.sync_engine)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
@@ -23,7 +39,18 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_read_db] = override_get_async_db
+app.dependency_overrides[get_async_sessionmaker] = lambda: TestingAsyncSessionLocal
+
+# Fresh item cache per test, since ids are reused after the tables are recreated
+test_item_cache = ItemCache()
+app.dependency_overrides[get_item_cache] = lambda: test_item_cache
 
 client = TestClient(app)
 
@@ -32,6 +59,8 @@ def setup_and_teardown():
     """Setup and teardown for each test"""
     # Setup
     Base.metadata.create_all(bind=engine)
+    global test_item_cache
+    test_item_cache = ItemCache()
     yield
     # Teardown
     Base.metadata.drop_all(bind=engine)
@@ -69,6 +98,108 @@ def test_get_nonexistent_item(setup_and_teardown):
     response = client.get("/api/v1/items/999")
     assert response.status_code == 404
 
+def test_get_item_reads_through_cache(setup_and_teardown):
+    """Test that repeated reads are served from the item cache"""
+    item_id = client.post("/api/v1/items", json={"title": "Cached"}).json()["id"]
+    assert client.get(f"/api/v1/items/{item_id}").status_code == 200
+    
+    # Remove the row behind the cache's back: the hot read must not hit the database
+    db = TestingSessionLocal()
+    try:
+        db.query(Item).filter(Item.id == item_id).delete()
+        db.commit()
+    finally:
+        db.close()
+    
+    response = client.get(f"/api/v1/items/{item_id}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Cached"
+    
+    stats = client.get("/api/v1/items/cache/stats").json()
+    assert stats["routes"]["get_item"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+def test_item_cache_follows_updates_and_deletes(setup_and_teardown):
+    """Test that writes refresh or invalidate cached items"""
+    item_id = client.post("/api/v1/items", json={"title": "Original"}).json()["id"]
+    client.get(f"/api/v1/items/{item_id}")
+    
+    client.put(f"/api/v1/items/{item_id}", json={"title": "Changed"})
+    assert client.get(f"/api/v1/items/{item_id}").json()["title"] == "Changed"
+    
+    client.delete(f"/api/v1/items/{item_id}")
+    assert client.get(f"/api/v1/items/{item_id}").status_code == 404
+
+@pytest.mark.asyncio
+async def test_item_cache_fill_does_not_overwrite_concurrent_writes(setup_and_teardown, monkeypatch):
+    """Test that a read-through fill racing a PUT or DELETE does not cache the old row"""
+    from starlette.requests import Request
+    from app.routes import items as item_routes
+    updated_id, deleted_id = _insert_items(2)
+    cache = ItemCache()
+    
+    async def concurrent_write(item_id):
+        if item_id == updated_id:
+            await cache.set(item_id, {"id": item_id, "title": "Changed"})
+        else:
+            await cache.invalidate(item_id)
+    
+    read_row = item_routes._get_item_or_404
+    async def read_then_write(db, item_id):
+        row = await read_row(db, item_id)
+        # A writer commits and updates the cache while the old row is in hand
+        await concurrent_write(item_id)
+        return row
+    monkeypatch.setattr(item_routes, "_get_item_or_404", read_then_write)
+    
+    request = Request({"type": "http", "headers": []})
+    async with TestingAsyncSessionLocal() as db:
+        for item_id in (updated_id, deleted_id):
+            assert (await item_routes.get_item(item_id, request, db, cache)).status_code == 200
+    
+    assert (await cache.get(updated_id, "test"))["title"] == "Changed"
+    assert await cache.get(deleted_id, "test") is None
+    assert cache.stats()["skipped_fills"] == 2
+
+def test_conditional_get_returns_304(setup_and_teardown):
+    """Test ETag / Last-Modified validators and 304 responses on get_item"""
+    item_id = client.post("/api/v1/items", json={"title": "Polled"}).json()["id"]
+    
+    # Version lookup without a cached row
+    response = client.get(f"/api/v1/items/{item_id}", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    
+    not_modified = client.get(f"/api/v1/items/{item_id}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
+    
+    assert client.get(f"/api/v1/items/{item_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(f"/api/v1/items/999", headers={"If-None-Match": etag}).status_code == 404
+    
+    client.put(f"/api/v1/items/{item_id}", json={"title": "Changed"})
+    assert client.get(f"/api/v1/items/{item_id}", headers={"If-None-Match": etag}).status_code == 200
+
+def test_update_item_honors_if_match(setup_and_teardown):
+    """Test optimistic concurrency with If-Match on PUT"""
+    item_id = client.post("/api/v1/items", json={"title": "Original"}).json()["id"]
+    etag = client.get(f"/api/v1/items/{item_id}").headers["ETag"]
+    
+    first = client.put(f"/api/v1/items/{item_id}", json={"title": "First writer"}, headers={"If-Match": etag})
+    assert first.status_code == 200
+    assert first.headers["ETag"] != etag
+    
+    second = client.put(f"/api/v1/items/{item_id}", json={"title": "Second writer"}, headers={"If-Match": etag})
+    assert second.status_code == 412
+    assert client.get(f"/api/v1/items/{item_id}").json()["title"] == "First writer"
+
+def test_update_and_delete_nonexistent_item(setup_and_teardown):
+    """Test that single-statement UPDATE/DELETE report 404 when no row matches"""
+    assert client.put("/api/v1/items/999", json={"title": "Nobody"}).status_code == 404
+    assert client.put("/api/v1/items/999", json={"title": "Nobody"}, headers={"If-Match": "*"}).status_code == 404
+    assert client.delete("/api/v1/items/999").status_code == 404
+
 def test_update_item(setup_and_teardown):
     """Test updating an item"""
     # First create an item
@@ -105,6 +236,318 @@ def test_delete_item(setup_and_teardown):
     get_response = client.get(f"/api/v1/items/{item_id}")
     assert get_response.status_code == 404
 
+def test_list_items_keyset_pagination(setup_and_teardown):
+    """Test paging through items with an opaque cursor"""
+    client.post("/api/v1/items/bulk", json=[{"title": f"Item {i}"} for i in range(5)])
+    
+    first_page = client.get("/api/v1/items", params={"limit": 2}).json()
+    assert [item["title"] for item in first_page["items"]] == ["Item 0", "Item 1"]
+    assert first_page["next_cursor"]
+    
+    second_page = client.get("/api/v1/items", params={"limit": 2, "cursor": first_page["next_cursor"]}).json()
+    assert [item["title"] for item in second_page["items"]] == ["Item 2", "Item 3"]
+    
+    last_page = client.get("/api/v1/items", params={"limit": 2, "cursor": second_page["next_cursor"]}).json()
+    assert [item["title"] for item in last_page["items"]] == ["Item 4"]
+    assert last_page["next_cursor"] is None
+
+def test_list_items_filters_and_invalid_cursor(setup_and_teardown):
+    """Test title filters and cursor validation on the list endpoint"""
+    client.post("/api/v1/items/bulk", json=[{"title": "alpha"}, {"title": "alpine"}, {"title": "beta"}, {"title": "al%"}])
+    
+    exact = client.get("/api/v1/items", params={"title": "beta"}).json()
+    assert [item["title"] for item in exact["items"]] == ["beta"]
+    
+    prefix = client.get("/api/v1/items", params={"title_prefix": "alp"}).json()
+    assert [item["title"] for item in prefix["items"]] == ["alpha", "alpine"]
+    
+    literal = client.get("/api/v1/items", params={"title_prefix": "al%"}).json()
+    assert [item["title"] for item in literal["items"]] == ["al%"]
+    
+    assert client.get("/api/v1/items", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/v1/items", params={"limit": 0}).status_code == 422
+
+def test_export_items_ndjson(setup_and_teardown):
+    """Test streaming the items table as NDJSON"""
+    client.post("/api/v1/items/bulk", json=[{"title": "First", "description": "one"}, {"title": "Second"}])
+    
+    response = client.get("/api/v1/items/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == ["First", "Second"]
+    assert rows[0]["description"] == "one"
+    assert "created_at" in rows[0]
+
+def test_export_items_csv(setup_and_teardown):
+    """Test streaming the items table as CSV"""
+    client.post("/api/v1/items/bulk", json=[{"title": "First, with comma"}, {"title": "Second"}])
+    
+    response = client.get("/api/v1/items/export", params={"format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["First, with comma", "Second"]
+    assert client.get("/api/v1/items/export", params={"format": "xml"}).status_code == 422
+
+def test_import_items_ndjson(setup_and_teardown):
+    """Test streaming NDJSON import with per-row errors"""
+    body = "\n".join([
+        json.dumps({"title": "First", "description": "one"}),
+        json.dumps({"description": "missing title"}),
+        "not json",
+        json.dumps({"title": "Fourth"}),
+    ])
+    response = client.post("/api/v1/items/import", content=body.encode())
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["failed"] == 2
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+    
+    titles = [item["title"] for item in client.get("/api/v1/items").json()["items"]]
+    assert titles == ["First", "Fourth"]
+
+def test_import_items_csv_round_trip(setup_and_teardown):
+    """Test that a CSV export can be imported back, including multi-line fields"""
+    client.post("/api/v1/items/bulk", json=[{"title": "First", "description": "line one\nline two"}, {"title": "Second"}])
+    exported = client.get("/api/v1/items/export", params={"format": "csv"}).content
+    
+    response = client.post("/api/v1/items/import", params={"format": "csv"}, content=exported)
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2, "failed": 0, "errors": []}
+    
+    items = client.get("/api/v1/items").json()["items"]
+    assert [item["description"] for item in items[2:]] == ["line one\nline two", None]
+
+def test_import_items_failure_reports_committed_rows(setup_and_teardown, monkeypatch):
+    """Test that an import failing on a later batch reports the rows already loaded"""
+    from app.utils import item_io
+    monkeypatch.setattr(item_io, "IMPORT_BATCH_SIZE", 2)
+    load_rows = item_io.load_rows
+    calls = []
+    async def failing_load_rows(session, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        await load_rows(session, rows)
+    monkeypatch.setattr(item_io, "load_rows", failing_load_rows)
+    
+    body = "\n".join(json.dumps({"title": f"Item {i}"}) for i in range(5))
+    response = client.post("/api/v1/items/import", content=body.encode())
+    assert response.status_code == 500
+    detail = response.json()["detail"]
+    assert detail["imported"] == 2
+    assert "disk full" in detail["error"]
+    assert [item["title"] for item in client.get("/api/v1/items").json()["items"]] == ["Item 0", "Item 1"]
+
+@pytest.mark.asyncio
+async def test_iter_lines_handles_chunk_boundaries():
+    """Test that lines and multi-byte characters split across chunks are reassembled"""
+    from app.utils.item_io import iter_lines
+    encoded = "caf\u00e9\nsecond line\nlast".encode()
+    
+    async def chunks():
+        for i in range(0, len(encoded), 3):
+            yield encoded[i:i + 3]
+    
+    assert [line async for line in iter_lines(chunks())] == ["caf\u00e9", "second line", "last"]
+
+@pytest.mark.asyncio
+async def test_iter_records_csv_stray_and_unterminated_quotes(monkeypatch):
+    """Test that a stray quote stays in its row and an unterminated quoted field is capped"""
+    from app.utils import item_io
+    monkeypatch.setattr(item_io, "MAX_CSV_RECORD_CHARS", 20)
+    
+    async def lines():
+        for line in ["title,description", 'say "hi,there', '"open,never closed', "more text", "and more", "last,row"]:
+            yield line
+    
+    records = [record async for record in item_io.iter_records(lines(), "csv")]
+    assert records[0] == (0, {"title": 'say "hi', "description": "there"})
+    assert isinstance(records[1][1], ValueError)
+    # Parsing resumes on the first line after the capped record
+    assert records[2:] == [(2, {"title": "and more"}), (3, {"title": "last", "description": "row"})]
+
+def test_list_items_filtered_by_external_data_key(setup_and_teardown):
+    """Test filtering items on a key inside the JSON external_data column"""
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Item(title="first", external_data={"userId": 1, "title": "a"}),
+            Item(title="second", external_data={"userId": 2, "title": "b"}),
+            Item(title="third", external_data=None),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    
+    response = client.get("/api/v1/items", params={"external_user_id": 2})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["title"] for item in items] == ["second"]
+    assert items[0]["external_data"] == {"userId": 2, "title": "b"}
+
+def test_search_items_ranked_and_paginated(setup_and_teardown):
+    """Test full-text search over title and description with cursor pagination"""
+    client.post("/api/v1/items/bulk", json=[
+        {"title": "Quarterly report", "description": "finance report for the board"},
+        {"title": "Grocery list", "description": "milk and eggs"},
+        {"title": "Report template", "description": "blank"},
+        {"title": "Meeting notes", "description": "discussed the annual report"},
+    ])
+    
+    first_page = client.get("/api/v1/items/search", params={"q": "report", "limit": 2}).json()
+    assert len(first_page["items"]) == 2
+    assert first_page["items"][0]["title"] == "Quarterly report"
+    assert first_page["items"][0]["rank"] >= first_page["items"][1]["rank"]
+    
+    second_page = client.get("/api/v1/items/search", params={"q": "report", "limit": 2, "cursor": first_page["next_cursor"]}).json()
+    titles = [item["title"] for item in first_page["items"] + second_page["items"]]
+    assert sorted(titles) == ["Meeting notes", "Quarterly report", "Report template"]
+    assert second_page["next_cursor"] is None
+    
+    assert client.get("/api/v1/items/search", params={"q": "\"eggs*"}).json()["items"][0]["title"] == "Grocery list"
+    assert client.get("/api/v1/items/search", params={"q": "***"}).json() == {"items": [], "next_cursor": None}
+
+def test_search_index_follows_updates_and_deletes(setup_and_teardown):
+    """Test that the search index tracks item updates and deletes"""
+    item_id = client.post("/api/v1/items", json={"title": "Old title"}).json()["id"]
+    client.put(f"/api/v1/items/{item_id}", json={"title": "Fresh title"})
+    
+    assert client.get("/api/v1/items/search", params={"q": "old"}).json()["items"] == []
+    assert [item["id"] for item in client.get("/api/v1/items/search", params={"q": "fresh"}).json()["items"]] == [item_id]
+    
+    client.delete(f"/api/v1/items/{item_id}")
+    assert client.get("/api/v1/items/search", params={"q": "fresh"}).json()["items"] == []
+
+def test_bulk_create_items(setup_and_teardown):
+    """Test creating many items in one request with per-row errors"""
+    response = client.post(
+        "/api/v1/items/bulk",
+        json=[
+            {"title": "First", "description": "one"},
+            {"description": "missing title"},
+            {"title": "Third"}
+        ]
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["title"] for item in data["items"]] == ["First", "Third"]
+    assert all("id" in item for item in data["items"])
+    assert len(data["errors"]) == 1
+    assert data["errors"][0]["index"] == 1
+    assert "title" in data["errors"][0]["error"]
+
+def test_bulk_update_items(setup_and_teardown):
+    """Test updating many items in one request"""
+    created = client.post(
+        "/api/v1/items/bulk",
+        json=[{"title": "First"}, {"title": "Second"}]
+    ).json()["items"]
+    
+    response = client.patch(
+        "/api/v1/items/bulk",
+        json=[
+            {"id": created[0]["id"], "title": "First updated"},
+            {"id": created[1]["id"], "title": "Second updated", "description": "changed"},
+            {"id": 999, "title": "Missing"},
+            {"id": created[0]["id"], "title": "Duplicate"}
+        ]
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["title"] for item in data["items"]] == ["First updated", "Second updated"]
+    assert [(error["index"], error["error"]) for error in data["errors"]] == [
+        (2, "Item not found"),
+        (3, "Duplicate item id in request")
+    ]
+    assert client.get(f"/api/v1/items/{created[1]['id']}").json()["description"] == "changed"
+
+def test_bulk_delete_items(setup_and_teardown):
+    """Test deleting many items in one request"""
+    created = client.post(
+        "/api/v1/items/bulk",
+        json=[{"title": "First"}, {"title": "Second"}]
+    ).json()["items"]
+    ids = [item["id"] for item in created]
+    
+    response = client.request("DELETE", "/api/v1/items/bulk", json={"ids": ids + [999]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["deleted"] == sorted(ids)
+    assert data["errors"] == [{"index": 2, "id": 999, "error": "Item not found"}]
+    assert client.get(f"/api/v1/items/{ids[0]}").status_code == 404
+
+@pytest.mark.asyncio
+async def test_read_replica_router_round_robin_and_failover():
+    """Test that reads skip a failed replica and fall back to the primary when none is healthy"""
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.database.replicas import ReadReplicaRouter
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent/dir/replica.db", poolclass=NullPool)
+    healthy = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+    router = ReadReplicaRouter([broken, healthy], TestingAsyncSessionLocal, retry_after=60)
+    
+    first = router.sessionmaker()
+    assert first.kw["bind"] is broken
+    with pytest.raises(OperationalError):
+        async with first() as db:
+            await db.execute(text("SELECT 1"))
+    
+    # The failed replica is skipped until retry_after passes
+    assert all(router.sessionmaker().kw["bind"] is healthy for _ in range(3))
+    
+    router.mark_unhealthy(1)
+    assert router.sessionmaker() is TestingAsyncSessionLocal
+    assert router.failovers == 1
+    await router.dispose()
+
+def test_metrics_endpoint(setup_and_teardown):
+    """Test that request counts, latency and pool gauges are exported for Prometheus"""
+    item_id = client.post("/api/v1/items", json={"title": "Test Item"}).json()["id"]
+    client.get(f"/api/v1/items/{item_id}")
+    client.get("/api/v1/does-not-exist")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/v1/items/{item_id}",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/v1/items/{item_id}"}' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'http_requests_in_progress{method="GET"} 1.0' in body  # the scrape itself
+    assert 'db_pool_checked_out{engine="sync"}' in body
+
+def test_server_timing_reports_queries_per_request(setup_and_teardown):
+    """Test that single-statement handlers report exactly one query"""
+    item_id = client.post("/api/v1/items", json={"title": "Test Item"}).json()["id"]
+    
+    get_response = client.get(f"/api/v1/items/{item_id}")
+    cached_response = client.get(f"/api/v1/items/{item_id}")
+    put_response = client.put(f"/api/v1/items/{item_id}", json={"title": "Changed"})
+    
+    assert get_response.headers["server-timing"].endswith('desc="1 query"')
+    assert cached_response.headers["server-timing"].endswith('desc="0 queries"')
+    assert put_response.headers["server-timing"].endswith('desc="1 query"')
+
+def test_query_limit_fails_requests_with_too_many_queries(setup_and_teardown, monkeypatch):
+    """Test the development guard against N+1 query patterns"""
+    monkeypatch.setattr(instrumentation, "MAX_QUERIES_PER_REQUEST", 1)
+    item_id = client.post("/api/v1/items", json={"title": "Test Item"}).json()["id"]
+    
+    # A version lookup plus the item read exceeds a budget of one
+    with pytest.raises(AssertionError, match="possible N\\+1"):
+        client.get(f"/api/v1/items/{item_id}", headers={"If-None-Match": '"stale"'})
+
+def test_slow_queries_are_logged_normalized(setup_and_teardown, monkeypatch, caplog):
+    """Test that statements over the threshold are logged with their normalized SQL"""
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    with caplog.at_level("WARNING", logger="app.database.instrumentation"):
+        client.get("/api/v1/items", params={"title": "needle"})
+    
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("in /api/v1/items)" in message and "needle" not in message and "LIMIT ?" in message for message in messages)
+
 def test_external_api_integration(setup_and_teardown):
     """Test external API integration"""
     # First create an item
@@ -123,6 +566,354 @@ def test_external_api_integration(setup_and_teardown):
     # If external API is not available, it should return 502
     assert response.status_code in [200, 502]
 
+class FakeExternalAPIService:
+    """Stand-in for ExternalAPIService that never touches the network"""
+
+    def __init__(self, payload=None):
+        self.payload = payload
+        self.calls = []
+
+    async def make_async_request(self, endpoint, method="GET", headers=None, params=None, data=None):
+        self.calls.append(endpoint)
+        return self.payload
+
+    async def get_cached(self, endpoint, params=None):
+        return await self.make_async_request(endpoint, params=params)
+
+def test_fetch_external_data_with_fake_upstream(setup_and_teardown):
+    """Test that upstream data is fetched asynchronously and stored on the item"""
+    create_response = client.post(
+        "/api/v1/items",
+        json={"title": "Test Item", "description": "This is a test item"}
+    )
+    item_id = create_response.json()["id"]
+    
+    fake_service = FakeExternalAPIService({"id": item_id, "title": "Post", "body": "Body", "userId": 1})
+    app.dependency_overrides[get_external_api_service] = lambda: fake_service
+    try:
+        response = client.get(f"/api/v1/external/fetch-data/{item_id}")
+        missing_response = client.get("/api/v1/external/fetch-data/999")
+    finally:
+        del app.dependency_overrides[get_external_api_service]
+    
+    assert response.status_code == 200
+    assert response.json()["external_data"] == {"id": item_id, "title": "Post", "body": "Body", "userId": 1}
+    assert fake_service.calls[0] == f"posts/{item_id}"
+    assert missing_response.status_code == 404
+
+def test_fetch_external_data_circuit_open(setup_and_teardown):
+    """Test that an open circuit breaker fails fast with 503 and Retry-After"""
+    from app.utils.circuit_breaker import CircuitOpenError
+    item_id = client.post("/api/v1/items", json={"title": "Test Item"}).json()["id"]
+    
+    class OpenCircuitService(FakeExternalAPIService):
+        async def get_cached(self, endpoint, params=None):
+            raise CircuitOpenError("jsonplaceholder.typicode.com", 12.3)
+    
+    app.dependency_overrides[get_external_api_service] = lambda: OpenCircuitService()
+    try:
+        response = client.get(f"/api/v1/external/fetch-data/{item_id}")
+        posts_response = client.get("/api/v1/external/posts")
+    finally:
+        del app.dependency_overrides[get_external_api_service]
+    
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "13"
+    assert posts_response.status_code == 503
+
+def test_fetch_external_data_upstream_failure(setup_and_teardown):
+    """Test that an upstream failure is reported as 502"""
+    create_response = client.post(
+        "/api/v1/items",
+        json={"title": "Test Item", "description": "This is a test item"}
+    )
+    item_id = create_response.json()["id"]
+    
+    app.dependency_overrides[get_external_api_service] = lambda: FakeExternalAPIService(None)
+    try:
+        response = client.get(f"/api/v1/external/fetch-data/{item_id}")
+    finally:
+        del app.dependency_overrides[get_external_api_service]
+    
+    assert response.status_code == 502
+
+@pytest.mark.asyncio
+async def test_fetch_external_data_survives_cancelled_first_caller(setup_and_teardown):
+    """Test that a coalesced enrichment still completes for others when the first caller is cancelled"""
+    import asyncio
+    from app.routes.external_api import fetch_external_data
+    from app.utils.write_behind import ExternalDataWriteBehind
+    item_id = _insert_items(1)[0]
+    
+    class SlowService(FakeExternalAPIService):
+        async def get_cached(self, endpoint, params=None):
+            await asyncio.sleep(0.05)
+            return await super().get_cached(endpoint, params)
+    
+    service = SlowService({"id": item_id, "title": "Post"})
+    writes = ExternalDataWriteBehind(TestingAsyncSessionLocal, ItemCache())
+    first = asyncio.create_task(fetch_external_data(item_id, TestingAsyncSessionLocal, service, ItemCache(), writes))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(fetch_external_data(item_id, TestingAsyncSessionLocal, service, ItemCache(), writes))
+    await asyncio.sleep(0)
+    first.cancel()
+    
+    item = await second
+    assert item.external_data == {"id": item_id, "title": "Post"}
+    assert service.calls == [f"posts/{item_id}"]
+
+def test_fetch_external_data_write_behind(setup_and_teardown):
+    """Test that queued writes are answered from the cache and written on flush"""
+    import asyncio
+    from app.utils.write_behind import ExternalDataWriteBehind, get_external_data_writes
+    item_id = client.post("/api/v1/items", json={"title": "Queued"}).json()["id"]
+
+    # Accept writes without a background task, and flush by hand
+    writes = ExternalDataWriteBehind(TestingAsyncSessionLocal, test_item_cache)
+    writes.running = True
+    fake_service = FakeExternalAPIService({"id": item_id, "title": "Post"})
+    app.dependency_overrides[get_external_api_service] = lambda: fake_service
+    app.dependency_overrides[get_external_data_writes] = lambda: writes
+    try:
+        assert client.get(f"/api/v1/external/fetch-data/{item_id}").status_code == 200
+        fake_service.payload = {"id": item_id, "title": "Newer post"}
+        response = client.get(f"/api/v1/external/fetch-data/{item_id}")
+        assert client.get("/api/v1/external/fetch-data/999").status_code == 404
+        stats = client.get("/api/v1/external/write-behind/stats").json()
+    finally:
+        del app.dependency_overrides[get_external_api_service]
+        del app.dependency_overrides[get_external_data_writes]
+
+    assert response.status_code == 200
+    assert response.json()["external_data"] == {"id": item_id, "title": "Newer post"}
+    assert client.get(f"/api/v1/items/{item_id}").json()["external_data"] == {"id": item_id, "title": "Newer post"}
+    assert (stats["queue_depth"], stats["submitted"], stats["coalesced"]) == (1, 2, 1)
+
+    db = TestingSessionLocal()
+    try:
+        assert db.get(Item, item_id).external_data is None
+        assert asyncio.run(writes.flush())
+        db.expire_all()
+        assert db.get(Item, item_id).external_data == {"id": item_id, "title": "Newer post"}
+    finally:
+        db.close()
+    assert writes.stats()["flushed_rows"] == 1
+    assert client.get(f"/api/v1/items/{item_id}").json()["external_data"] == {"id": item_id, "title": "Newer post"}
+
+def test_if_match_with_etag_of_queued_write(setup_and_teardown):
+    """Test that an ETag returned for a queued write is accepted by If-Match before the flush"""
+    from app.utils.write_behind import ExternalDataWriteBehind, get_external_data_writes
+    item_id = client.post("/api/v1/items", json={"title": "Queued"}).json()["id"]
+
+    writes = ExternalDataWriteBehind(TestingAsyncSessionLocal, test_item_cache)
+    writes.running = True
+    app.dependency_overrides[get_external_api_service] = lambda: FakeExternalAPIService({"id": item_id})
+    app.dependency_overrides[get_external_data_writes] = lambda: writes
+    try:
+        assert client.get(f"/api/v1/external/fetch-data/{item_id}").status_code == 200
+        etag = client.get(f"/api/v1/items/{item_id}").headers["ETag"]
+        response = client.put(f"/api/v1/items/{item_id}", json={"title": "Edited"}, headers={"If-Match": etag})
+    finally:
+        del app.dependency_overrides[get_external_api_service]
+        del app.dependency_overrides[get_external_data_writes]
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "Edited"
+    assert response.json()["external_data"] == {"id": item_id}
+    assert writes.stats()["queue_depth"] == 0
+
+def test_if_match_returns_503_when_queued_write_cannot_flush(setup_and_teardown, monkeypatch):
+    """Test that If-Match is not evaluated against a row whose queued write failed to flush"""
+    from app.utils.write_behind import ExternalDataWriteBehind, get_external_data_writes
+    item_id = client.post("/api/v1/items", json={"title": "Queued"}).json()["id"]
+
+    writes = ExternalDataWriteBehind(TestingAsyncSessionLocal, test_item_cache)
+    writes.running = True
+    app.dependency_overrides[get_external_api_service] = lambda: FakeExternalAPIService({"id": item_id})
+    app.dependency_overrides[get_external_data_writes] = lambda: writes
+    try:
+        assert client.get(f"/api/v1/external/fetch-data/{item_id}").status_code == 200
+        etag = client.get(f"/api/v1/items/{item_id}").headers["ETag"]
+        async def failing_write(batch):
+            writes._pending.update(batch)
+            return False
+        monkeypatch.setattr(writes, "_write", failing_write)
+        response = client.put(f"/api/v1/items/{item_id}", json={"title": "Edited"}, headers={"If-Match": etag})
+    finally:
+        del app.dependency_overrides[get_external_api_service]
+        del app.dependency_overrides[get_external_data_writes]
+
+    assert response.status_code == 503
+    assert writes.stats()["queue_depth"] == 1
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_batches_and_drains_on_stop(setup_and_teardown):
+    """Test that the background task flushes full batches and stop() drains the rest"""
+    import asyncio
+    from datetime import datetime
+    from app.utils.write_behind import ExternalDataWriteBehind
+    item_ids = _insert_items(3)
+
+    writes = ExternalDataWriteBehind(TestingAsyncSessionLocal, ItemCache(), max_batch=2, flush_interval=60)
+    assert not writes.submit(item_ids[0], {"n": 0}, datetime.utcnow())
+    await writes.start()
+    assert writes.submit(item_ids[0], {"n": 1}, datetime.utcnow())
+    assert writes.submit(item_ids[1], {"n": 2}, datetime.utcnow())
+    for _ in range(100):
+        if writes.flushes:
+            break
+        await asyncio.sleep(0.01)
+    assert writes.flushes == 1
+
+    assert writes.submit(item_ids[2], {"n": 3}, datetime.utcnow())
+    await writes.stop()
+    assert writes.stats()["queue_depth"] == 0
+    assert not writes.submit(item_ids[2], {"n": 4}, datetime.utcnow())
+
+    db = TestingSessionLocal()
+    try:
+        enriched = {item.id: item.external_data for item in db.query(Item).all()}
+    finally:
+        db.close()
+    assert enriched == {item_ids[0]: {"n": 1}, item_ids[1]: {"n": 2}, item_ids[2]: {"n": 3}}
+
+def _insert_items(count):
+    db = TestingSessionLocal()
+    try:
+        db.add_all([Item(title=f"Item {i}") for i in range(count)])
+        db.commit()
+        return [item_id for (item_id,) in db.query(Item.id).order_by(Item.id).all()]
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_enrichment_job_enriches_items_in_batches(setup_and_teardown, monkeypatch):
+    """Test that a batch job fetches every selected item and reports failures"""
+    from app.utils import enrichment
+    monkeypatch.setattr(enrichment, "ENRICHMENT_BATCH_SIZE", 2)
+    item_ids = _insert_items(5)
+    
+    class PartialService(FakeExternalAPIService):
+        base_url = "https://api.example.com"
+        async def make_async_request(self, endpoint, method="GET", headers=None, params=None, data=None):
+            self.calls.append(endpoint)
+            return None if endpoint == f"posts/{item_ids[3]}" else {"endpoint": endpoint}
+    
+    manager = enrichment.EnrichmentJobManager()
+    job = manager.submit(
+        enrichment.EnrichmentJobCreate(item_ids=item_ids[1:] + [999]),
+        TestingAsyncSessionLocal, PartialService()
+    )
+    await job.task
+    
+    status = job.to_status()
+    assert status.status == "completed"
+    assert (status.total, status.processed, status.succeeded, status.failed) == (4, 4, 3, 1)
+    assert status.failed_item_ids == [item_ids[3]]
+    
+    db = TestingSessionLocal()
+    try:
+        enriched = {item.id: item.external_data for item in db.query(Item).all()}
+    finally:
+        db.close()
+    assert enriched[item_ids[0]] is None
+    assert enriched[item_ids[1]] == {"endpoint": f"posts/{item_ids[1]}"}
+    assert enriched[item_ids[3]] is None
+
+@pytest.mark.asyncio
+async def test_enrichment_job_resumes_from_checkpoint(setup_and_teardown, monkeypatch):
+    """Test that a failed job resumes after its last completed batch"""
+    from app.utils import enrichment
+    monkeypatch.setattr(enrichment, "ENRICHMENT_BATCH_SIZE", 2)
+    item_ids = _insert_items(4)
+    
+    class FlakyService(FakeExternalAPIService):
+        base_url = "https://api.example.com"
+        broken = True
+        async def make_async_request(self, endpoint, method="GET", headers=None, params=None, data=None):
+            self.calls.append(endpoint)
+            if self.broken and endpoint == f"posts/{item_ids[2]}":
+                raise RuntimeError("upstream exploded")
+            return {"endpoint": endpoint}
+    
+    service = FlakyService()
+    manager = enrichment.EnrichmentJobManager()
+    job = manager.submit(enrichment.EnrichmentJobCreate(only_missing=True), TestingAsyncSessionLocal, service)
+    await job.task
+    assert job.status == "failed"
+    assert job.last_item_id == item_ids[1]
+    assert job.processed == 2
+    
+    service.broken = False
+    service.calls.clear()
+    manager.start(job, TestingAsyncSessionLocal, service)
+    await job.task
+    assert job.status == "completed"
+    assert job.processed == 4
+    assert service.calls == [f"posts/{item_ids[2]}", f"posts/{item_ids[3]}"]
+
+@pytest.mark.asyncio
+async def test_enrichment_job_failure_cancels_batch_and_cancel_reports_status(setup_and_teardown):
+    """Test that a failed fetch stops its siblings and a cancelled job reports cancelled"""
+    import asyncio
+    from app.utils import enrichment
+    item_ids = _insert_items(3)
+    
+    class HangingService(FakeExternalAPIService):
+        base_url = "https://api.example.com"
+        def __init__(self):
+            super().__init__()
+            self.cancelled = 0
+        async def make_async_request(self, endpoint, method="GET", headers=None, params=None, data=None):
+            self.calls.append(endpoint)
+            if endpoint == f"posts/{item_ids[0]}":
+                raise RuntimeError("upstream exploded")
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+    
+    service = HangingService()
+    manager = enrichment.EnrichmentJobManager()
+    job = manager.submit(enrichment.EnrichmentJobCreate(), TestingAsyncSessionLocal, service)
+    await asyncio.wait_for(job.task, 5)
+    assert job.status == "failed"
+    assert service.cancelled == 2
+    
+    job = manager.submit(enrichment.EnrichmentJobCreate(after_id=item_ids[0]), TestingAsyncSessionLocal, service)
+    await asyncio.sleep(0.05)
+    await manager.cancel(job)
+    assert job.status == "cancelled"
+    assert job.finished_at is not None
+
+def test_enrichment_jobs_are_pruned():
+    """Test that finished jobs expire after the TTL and the job count is capped"""
+    from datetime import datetime, timedelta
+    from app.utils import enrichment
+    manager = enrichment.EnrichmentJobManager(finished_job_ttl=60, max_jobs=2)
+    
+    def finished_job(age):
+        job = enrichment.EnrichmentJob(enrichment.EnrichmentJobCreate())
+        job.status = "completed"
+        job.finished_at = datetime.utcnow() - timedelta(seconds=age)
+        manager.jobs[job.id] = job
+        return job
+    
+    expired, recent = finished_job(120), finished_job(10)
+    manager._prune()
+    assert expired.id not in manager.jobs
+    assert list(manager.jobs) == [recent.id]
+    
+    newer = finished_job(5)
+    manager._prune()
+    assert list(manager.jobs) == [newer.id]
+
+def test_enrichment_job_not_found(setup_and_teardown):
+    """Test that unknown enrichment jobs return 404"""
+    assert client.get("/api/v1/external/enrich/unknown").status_code == 404
+    assert client.post("/api/v1/external/enrich/unknown/resume").status_code == 404
+
 def test_get_external_posts(setup_and_teardown):
     """Test getting external posts"""
     # Call the external posts endpoint
@@ -146,4 +937,21 @@ def test_root_endpoint(setup_and_teardown):
     response = client.get("/")
     assert response.status_code == 200
     data = response.json()
-    assert "message" in data
\ No newline at end of file
+    assert "message" in data
+
+def test_profiling_middleware_profiles_only_tokened_requests(setup_and_teardown, tmp_path):
+    """Test that a request is profiled only when it carries the profiling token"""
+    from app.utils.profiling import ProfilingMiddleware
+    profiled_client = TestClient(ProfilingMiddleware(app, token="secret", directory=str(tmp_path)))
+    item_id = client.post("/api/v1/items", json={"title": "Test Item"}).json()["id"]
+    
+    plain = profiled_client.get(f"/api/v1/items/{item_id}")
+    wrong = profiled_client.get(f"/api/v1/items/{item_id}", headers={"X-Profile": "guess"})
+    assert "x-profile-file" not in plain.headers
+    assert "x-profile-file" not in wrong.headers
+    assert list(tmp_path.iterdir()) == []
+    
+    profiled = profiled_client.get(f"/api/v1/items/{item_id}", headers={"X-Profile": "secret"})
+    assert profiled.status_code == 200
+    assert profiled.json()["title"] == "Test Item"
+    assert [path.name for path in tmp_path.iterdir()] == [profiled.headers["x-profile-file"]]
@@ -0,0 +1,141 @@
+import pytest
+from app.utils.cache import TTLCache
+
+
+def test_cache_hit_and_miss():
+    """Test that stored values are returned and counted"""
+    cache = TTLCache(max_entries=10, default_ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", {"id": 1})
+    
+    entry = cache.get("a")
+    assert entry.value == {"id": 1}
+    assert entry.is_fresh()
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_lru_eviction():
+    """Test that the least recently used entry is evicted when full"""
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a").value == 1
+    assert cache.get("c").value == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_serves_stale_entries_within_stale_window():
+    """Test that expired entries are served as stale until the stale window ends"""
+    cache = TTLCache(default_ttl=0, stale_ttl=60)
+    cache.set("a", 1)
+    
+    entry = cache.get("a")
+    assert entry.value == 1
+    assert not entry.is_fresh()
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_cache_drops_entries_past_stale_window():
+    """Test that entries past TTL and stale window are treated as misses"""
+    cache = TTLCache(default_ttl=0, stale_ttl=0)
+    cache.set("a", 1)
+    
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_disk_cache_survives_restart_and_is_shared(tmp_path):
+    """Test that entries persist across instances (restarts / other workers) with their validators"""
+    from app.utils.disk_cache import DiskCache
+    path = str(tmp_path / "upstream.db")
+    DiskCache(path).set(("posts", ()), [{"id": 1}], ttl=60, etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    
+    entry = DiskCache(path).get(("posts", ()))
+    assert entry.value == [{"id": 1}]
+    assert entry.is_fresh()
+    assert entry.etag == '"v1"'
+    assert entry.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+def test_disk_cache_lru_eviction(tmp_path, monkeypatch):
+    """Test that the disk cache is capped with least recently used eviction"""
+    from app.utils import disk_cache
+    monkeypatch.setattr(disk_cache, "ACCESS_WRITE_INTERVAL", -1)
+    cache = disk_cache.DiskCache(str(tmp_path / "upstream.db"), max_entries=2, memory_entries=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a").value == 1
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_cache_keeps_expired_entries_for_revalidation(tmp_path):
+    """Test that entries past the stale window are misses but still available to peek"""
+    from app.utils.disk_cache import DiskCache
+    cache = DiskCache(str(tmp_path / "upstream.db"), default_ttl=0, stale_ttl=0)
+    cache.set("a", {"id": 1}, etag='"v1"')
+    
+    assert cache.get("a") is None
+    assert cache.peek("a").etag == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_async_keeps_stale_entries_in_memory(tmp_path):
+    """Test that a stale disk hit is remembered in memory and writes to a locked file are skipped"""
+    import sqlite3
+    from app.utils.disk_cache import DiskCache
+    path = str(tmp_path / "upstream.db")
+    cache = DiskCache(path, default_ttl=0, stale_ttl=60, busy_timeout=0)
+    await cache.set_async("a", {"id": 1})
+    
+    assert (await cache.get_async("a")).value == {"id": 1}
+    # Hold a write lock: "a" is still served and the write of "c" gives up instead of waiting
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+    try:
+        entry = await cache.get_async("a")
+        assert entry.value == {"id": 1}
+        assert not entry.is_fresh()
+        assert await cache.get_async("b") is None
+        await cache.set_async("c", 3)
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    assert cache.stale_hits == 2
+    assert cache.misses == 1
+    assert cache.peek("c") is None
+
+
+def test_item_cache_backend_requires_every_method():
+    """Test that a backend missing part of the interface fails at construction"""
+    from app.utils.item_cache import ItemCacheBackend
+    
+    class PartialBackend(ItemCacheBackend):
+        async def get(self, key):
+            return None
+    
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+
+@pytest.mark.asyncio
+async def test_item_cache_fill_respects_forgotten_writes():
+    """Test that fills started before a write that is no longer tracked are dropped"""
+    from app.utils.item_cache import ItemCache
+    cache = ItemCache(max_tracked=1)
+    since = cache.sequence()
+    await cache.invalidate(1)
+    await cache.invalidate(2)  # pushes item 1's write out of the tracked set
+    
+    assert not await cache.fill(1, {"id": 1}, since)
+    assert await cache.fill(3, {"id": 3}, cache.sequence())
+    assert await cache.get(3, "test") == {"id": 3}
@@ -1,7 +1,7 @@
 import pytest
 import asyncio
 from unittest.mock import patch, AsyncMock
-from app.utils.external_api_service import ExternalAPIService
+from app.utils.external_api_service import ExternalAPIService, UpstreamResponse
 
 
 @pytest.fixture
@@ -17,7 +17,7 @@ def test_external_api_service_init():
     assert service.max_retries == 3
 
 
-@patch('requests.request')
+@patch('requests.Session.request')
 def test_make_request_success(mock_request):
     """Test successful request to external API"""
     mock_request.return_value.status_code = 200
@@ -30,7 +30,7 @@ def test_make_request_success(mock_request):
     mock_request.assert_called_once()
 
 
-@patch('requests.request')
+@patch('requests.Session.request')
 def test_make_request_with_timeout(mock_request):
     """Test request with timeout error"""
     from requests.exceptions import Timeout
@@ -42,7 +42,7 @@ def test_make_request_with_timeout(mock_request):
     assert result is None
 
 
-@patch('requests.request')
+@patch('requests.Session.request')
 def test_make_request_with_connection_error(mock_request):
     """Test request with connection error"""
     from requests.exceptions import ConnectionError
@@ -55,17 +55,19 @@ def test_make_request_with_connection_error(mock_request):
 
 
 @pytest.mark.asyncio
-@patch('aiohttp.ClientSession.request', new_callable=AsyncMock)
+@patch('aiohttp.ClientSession.request')
 async def test_make_async_request_success(mock_request):
     """Test successful async request to external API"""
     # Mock the response object
     mock_response = AsyncMock()
     mock_response.status = 200
+    mock_response.headers = {}
     mock_response.json = AsyncMock(return_value={"id": 1, "title": "Test", "body": "Test body", "userId": 1})
     mock_request.return_value.__aenter__.return_value = mock_response
     
     service = ExternalAPIService(base_url="https://api.example.com")
     result = await service.make_async_request("posts/1")
+    await service.close()
     
     assert result == {"id": 1, "title": "Test", "body": "Test body", "userId": 1}
 
@@ -80,4 +82,274 @@ async def test_make_async_request_timeout(mock_request):
     service = ExternalAPIService(base_url="https://api.example.com", max_retries=1)
     result = await service.make_async_request("posts/1")
     
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+
+@pytest.mark.asyncio
+async def test_async_session_is_shared_between_requests():
+    """Test that the pooled ClientSession is reused until the service is closed"""
+    service = ExternalAPIService(base_url="https://api.example.com", pool_limit=10, pool_limit_per_host=2)
+    await service.start()
+    session = service._get_session()
+    
+    assert service._get_session() is session
+    assert session.connector.limit == 10
+    assert session.connector.limit_per_host == 2
+    
+    await service.close()
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_get_cached_serves_hits_without_upstream_call():
+    """Test that a cached response is returned without calling upstream again"""
+    service = ExternalAPIService(base_url="https://api.example.com", cache_ttls={"posts/*": 60})
+    service.fetch_resource = AsyncMock(return_value=UpstreamResponse(200, {"id": 1}))
+    
+    first = await service.get_cached("posts/1")
+    second = await service.get_cached("posts/1")
+    
+    assert first == second == {"id": 1}
+    service.fetch_resource.assert_awaited_once()
+    assert service.cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_cached_refreshes_stale_entries_in_background():
+    """Test that a stale entry is served immediately and refreshed in the background"""
+    service = ExternalAPIService(base_url="https://api.example.com", cache_ttls={"posts/*": 0})
+    service.fetch_resource = AsyncMock(side_effect=[UpstreamResponse(200, {"version": 1}), UpstreamResponse(200, {"version": 2})])
+    
+    assert await service.get_cached("posts/1") == {"version": 1}
+    assert await service.get_cached("posts/1") == {"version": 1}
+    await asyncio.gather(*service._refreshing.values())
+    
+    assert service.cache.get(service._cache_key("posts/1", None)).value == {"version": 2}
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_does_not_share_a_conditional_revalidation():
+    """Test that a miss during a background revalidation of an evicted entry still gets the full response"""
+    service = ExternalAPIService(base_url="https://api.example.com", cache_ttls={"posts/*": 0})
+    
+    async def exchange(url, method, headers, params, data):
+        if headers:
+            await asyncio.sleep(0.05)
+            return UpstreamResponse(304, None, headers.get("If-None-Match"))
+        return UpstreamResponse(200, {"version": 2}, '"v2"')
+    
+    service._exchange = exchange
+    key = service._cache_key("posts/1", None)
+    service.cache.set(key, {"version": 1}, 0, etag='"v1"')
+    
+    assert await service.get_cached("posts/1") == {"version": 1}
+    await asyncio.sleep(0)  # the revalidation is now in flight
+    service.cache.delete(key)
+    assert await service.get_cached("posts/1") == {"version": 2}
+    await asyncio.gather(*service._refreshing.values())
+
+
+@pytest.mark.asyncio
+async def test_get_cached_does_not_cache_failures():
+    """Test that failed upstream calls are not cached"""
+    service = ExternalAPIService(base_url="https://api.example.com")
+    service.fetch_resource = AsyncMock(side_effect=[None, UpstreamResponse(200, {"id": 1})])
+    
+    assert await service.get_cached("posts/1") is None
+    assert await service.get_cached("posts/1") == {"id": 1}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_upstream_call():
+    """Test that concurrent identical GETs are coalesced into one upstream request"""
+    service = ExternalAPIService(base_url="https://api.example.com")
+    calls = []
+    
+    async def slow_send(url, method, headers, params, data):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return {"url": url}
+    
+    service._send_async_request = slow_send
+    results = await asyncio.gather(*[service.make_async_request("posts/1") for _ in range(10)])
+    other = await service.make_async_request("posts/2")
+    
+    assert len(calls) == 2
+    assert all(result == {"url": "https://api.example.com/posts/1"} for result in results)
+    assert other == {"url": "https://api.example.com/posts/2"}
+    assert service.flight.stats() == {"in_flight": 0, "executions": 2, "shared": 9}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    """Test that all coalesced callers see the leader's exception"""
+    from app.utils.single_flight import SingleFlight
+    flight = SingleFlight()
+    
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    
+    results = await asyncio.gather(*[flight.do("key", failing) for _ in range(3)], return_exceptions=True)
+    
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["executions"] == 1
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test closed -> open -> half-open -> closed transitions"""
+    from app.utils.circuit_breaker import CircuitBreaker
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    assert 0 < breaker.retry_after() <= 0.05
+    
+    import time
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats()["times_opened"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_timeout_does_not_touch_the_breaker():
+    """Test that running out of deadline waiting for a rate limit token is neither a success nor a failure"""
+    service = ExternalAPIService(base_url="https://api.example.com", rate_limit_per_host=0.01, deadline=0.05)
+    service.rate_limiter.bucket("api.example.com").try_acquire()  # spend the only token
+    breaker = service.breaker("api.example.com")
+    breaker.record_failure()
+    
+    assert await service.make_async_request("posts/1") is None
+    assert breaker.stats()["consecutive_failures"] == 1
+    
+    # A half-open probe that never reached the upstream gives its slot back
+    breaker._state = breaker.HALF_OPEN
+    breaker._half_open_calls = 0
+    assert await service.make_async_request("posts/2") is None
+    assert breaker.allow_request()
+
+
+@patch('requests.Session.request')
+def test_make_request_fails_fast_while_circuit_is_open(mock_request):
+    """Test that an open circuit rejects calls without touching the upstream"""
+    from requests.exceptions import ConnectionError
+    from app.utils.circuit_breaker import CircuitOpenError
+    mock_request.side_effect = ConnectionError()
+    
+    service = ExternalAPIService(base_url="https://api.example.com", max_retries=1, breaker_failure_threshold=1)
+    assert service.make_request("posts/1") is None
+    with pytest.raises(CircuitOpenError) as exc_info:
+        service.make_request("posts/1")
+    
+    assert mock_request.call_count == 1
+    assert exc_info.value.host == "api.example.com"
+    assert service.breaker_stats()["api.example.com"]["state"] == "open"
+
+
+@patch('time.sleep')
+@patch('requests.Session.request')
+def test_make_request_honors_retry_after(mock_request, mock_sleep):
+    """Test that a 429 is retried after the upstream's Retry-After delay"""
+    limited = type("Response", (), {"status_code": 429, "headers": {"Retry-After": "2"}, "text": ""})()
+    ok = type("Response", (), {"status_code": 200, "headers": {}, "json": lambda self: {"id": 1}})()
+    mock_request.side_effect = [limited, ok]
+    
+    service = ExternalAPIService(base_url="https://api.example.com", max_retries=3)
+    
+    assert service.make_request("posts/1") == {"id": 1}
+    mock_sleep.assert_called_once_with(2.0)
+
+
+@patch('time.sleep')
+@patch('requests.Session.request')
+def test_make_request_stops_when_deadline_is_spent(mock_request, mock_sleep):
+    """Test that a Retry-After beyond the deadline budget ends the retries"""
+    limited = type("Response", (), {"status_code": 503, "headers": {"Retry-After": "60"}, "text": ""})()
+    mock_request.return_value = limited
+    
+    service = ExternalAPIService(base_url="https://api.example.com", max_retries=3, deadline=5)
+    
+    assert service.make_request("posts/1") is None
+    assert mock_request.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+@patch('requests.Session.request')
+def test_make_request_does_not_retry_client_errors(mock_request):
+    """Test that non-retryable statuses return immediately and keep the circuit closed"""
+    mock_request.return_value.status_code = 404
+    
+    service = ExternalAPIService(base_url="https://api.example.com", max_retries=3, breaker_failure_threshold=1)
+    
+    assert service.make_request("posts/1") is None
+    mock_request.assert_called_once()
+    assert service.breaker("api.example.com").state == "closed"
+
+
+@patch('requests.Session.request')
+def test_upstream_calls_are_counted_by_outcome(mock_request):
+    """Test that upstream attempts are exported as Prometheus counters and latency"""
+    from prometheus_client import REGISTRY
+    mock_request.return_value.status_code = 200
+    mock_request.return_value.json.return_value = {"id": 1}
+    
+    service = ExternalAPIService(base_url="https://metrics.example.com")
+    service.make_request("posts/1")
+    
+    labels = {"host": "metrics.example.com", "outcome": "success"}
+    assert REGISTRY.get_sample_value("external_api_requests_total", labels) == 1
+    assert REGISTRY.get_sample_value("external_api_request_duration_seconds_count", {"host": "metrics.example.com"}) == 1
+
+
+@pytest.mark.asyncio
+async def test_service_against_local_fake_upstream():
+    """Test the real aiohttp request path against the benchmark's fake upstream"""
+    from benchmarks.fake_upstream import STATS_KEY, create_app, start_server
+    runner, port = await start_server(create_app(latency_ms=1, post_count=10))
+    service = ExternalAPIService(base_url=f"http://127.0.0.1:{port}", max_retries=2)
+    try:
+        post = await service.make_async_request("posts/3")
+        posts = await service.get_cached("posts")
+        missing = await service.make_async_request("posts/11")
+    finally:
+        await service.close()
+        await runner.cleanup()
+    
+    assert post["id"] == 3 and post["userId"] == 1
+    assert len(posts) == 10
+    assert missing is None
+    assert runner.app[STATS_KEY]["requests"] == 3  # the 404 is not retried
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_revalidated_with_conditional_requests(tmp_path):
+    """Test that an expired cached response is revalidated (304) instead of re-downloaded, across restarts"""
+    from benchmarks.fake_upstream import STATS_KEY, create_app, start_server
+    from app.utils.disk_cache import DiskCache
+    runner, port = await start_server(create_app(post_count=10))
+    path = str(tmp_path / "upstream.db")
+    services = [
+        ExternalAPIService(base_url=f"http://127.0.0.1:{port}", cache=DiskCache(path, stale_ttl=0), cache_ttls={"posts": 0})
+        for _ in range(2)
+    ]
+    try:
+        first = await services[0].get_cached("posts")
+        second = await services[0].get_cached("posts")
+        after_restart = await services[1].get_cached("posts")
+    finally:
+        for service in services:
+            await service.close()
+        await runner.cleanup()
+    
+    assert first == second == after_restart
+    assert len(first) == 10
+    assert runner.app[STATS_KEY]["requests"] == 3
+    assert runner.app[STATS_KEY]["not_modified"] == 2
+    assert services[0].revalidated == 1 and services[1].revalidated == 1
@@ -0,0 +1,33 @@
+import json
+from datetime import datetime
+import pytest
+from app.utils import json_response
+from app.utils.json_response import FastJSONResponse, dumps
+
+
+CONTENT = {"id": 1, "title": "Café", "updated_at": datetime(2024, 1, 2, 3, 4, 5), "external_data": {1: "one"}}
+EXPECTED = {"id": 1, "title": "Café", "updated_at": "2024-01-02T03:04:05", "external_data": {"1": "one"}}
+
+
+def test_dumps_encodes_datetimes_and_non_string_keys():
+    """Test that dumps writes datetimes as ISO 8601 and accepts non-string keys"""
+    assert json_response.orjson is not None
+    assert json.loads(dumps(CONTENT)) == EXPECTED
+
+
+def test_dumps_stdlib_fallback(monkeypatch):
+    """Test that dumps gives the same JSON without orjson"""
+    monkeypatch.setattr(json_response, "orjson", None)
+    body = dumps(CONTENT)
+    assert json.loads(body) == EXPECTED
+    assert "Café".encode() in body
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_fast_json_response_renders_bytes():
+    """Test that FastJSONResponse renders its content with dumps"""
+    response = FastJSONResponse(CONTENT, status_code=201)
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/json"
+    assert json.loads(response.body) == EXPECTED